@@ -6,10 +6,10 @@ Batch‑evaluate document‑summary pairs using any LLM exposed through OpenRout
 See README.md for usage.
 """
 from __future__ import annotations
-import argparse, json, time, os
+import argparse, asyncio, hashlib, json, sqlite3, time, os
 from pathlib import Path
-from typing import List, Dict, Any
-import openai, dotenv, tqdm
+from typing import List, Dict, Any, Optional, Tuple
+import aiohttp, openai, dotenv, tqdm
 
 # ---- helpers ---------------------------------------------------------------
 def load_json(path: Path) -> Any:      return json.loads(path.read_text(encoding="utf-8"))
@@ -17,38 +17,236 @@ def read_text(path: Path) -> str:      return path.read_text(encoding="utf-8")
 def build_prompt(tpl: str, doc: str, summ: str) -> str:
     return tpl.replace("{{Document}}", doc).replace("{{Summary}}", summ)
 
-def query(prompt: str, *, model: str, n: int, max_toks: int, temp: float) -> List[str]:
-    resp = openai.ChatCompletion.create(
+async def query(prompt: str, *, model: str, n: int, max_toks: int, temp: float) -> List[str]:
+    resp = await openai.ChatCompletion.acreate(
         model=model,
         messages=[{"role": "user", "content": prompt}],
         n=n, temperature=temp, max_tokens=max_toks, top_p=1
     )
     return [c["message"]["content"] for c in resp["choices"]]
 
+def retry_after(e: Exception) -> Optional[float]:
+    try:    return float((getattr(e, "headers", None) or {}).get("retry-after"))
+    except (TypeError, ValueError): return None
+
+# ---- response cache --------------------------------------------------------
+class ResponseCache:
+    """Disk cache of completions keyed by sha256(model, sampling params, prompt), so
+    re-running with an edited template only pays for prompts that actually changed.
+    Least recently used entries are evicted once the stored responses exceed `max_bytes`."""
+    def __init__(self, path: Path, max_bytes: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)   # autocommit: every put survives a crash
+        self.db.execute("PRAGMA journal_mode=WAL"); self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, "
+                        "responses TEXT, size INTEGER, created REAL, last_used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.max_bytes, self.touched = max_bytes, {}
+        self.hits = self.misses = self.stores = self.evicted = 0
+
+    @staticmethod
+    def key(prompt: str, **params: Any) -> str:
+        return hashlib.sha256(json.dumps({**params, "prompt": prompt}, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        row = self.db.execute("SELECT responses FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None: self.misses += 1; return None
+        self.hits += 1; self.touched[key] = time.time()    # last_used is written back in close()
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, responses: List[str]) -> None:
+        blob, now = json.dumps(responses, ensure_ascii=False), time.time()
+        self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, model, blob, len(blob.encode("utf-8")), now, now))
+        self.stores += 1
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        cur = self.db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM (SELECT key, "
+                              "SUM(size) OVER (ORDER BY last_used DESC, key) AS kept FROM responses) WHERE kept > ?)",
+                              (self.max_bytes,))
+        self.evicted += cur.rowcount
+        return cur.rowcount
+
+    def close(self) -> None:
+        self.db.executemany("UPDATE responses SET last_used = ? WHERE key = ?", [(t, k) for k, t in self.touched.items()])
+        self.evict(); self.db.close()
+
+    def summary(self) -> str:
+        looked = self.hits + self.misses
+        return (f"cache: hits={self.hits} misses={self.misses} ({self.hits / max(looked, 1):.0%} hit rate)  "
+                f"stored={self.stores} evicted={self.evicted}")
+
+# ---- async engine ----------------------------------------------------------
+class AdaptiveLimiter:
+    """At most `limit` requests in flight. A 429 halves the limit and pauses new
+    requests (Retry-After or backoff); `grow_after` straight successes add one
+    slot back, up to `max_limit` (AIMD, like TCP congestion control)."""
+    def __init__(self, limit: int, grow_after: int = 20):
+        self.limit = self.max_limit = limit
+        self.grow_after, self.streak, self.active = grow_after, 0, 0
+        self.pause_until, self.throttles = 0.0, 0
+        self.cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        delay = self.pause_until - time.monotonic()
+        if delay > 0: await asyncio.sleep(delay)
+
+    async def __aexit__(self, *exc):
+        async with self.cond:
+            self.active -= 1; self.cond.notify_all()
+
+    async def success(self) -> None:
+        async with self.cond:
+            self.streak += 1
+            if self.streak >= self.grow_after and self.limit < self.max_limit:
+                self.limit, self.streak = self.limit + 1, 0; self.cond.notify_all()
+
+    async def throttled(self, wait: float) -> None:
+        async with self.cond:
+            now, self.streak, self.throttles = time.monotonic(), 0, self.throttles + 1
+            if now >= self.pause_until:   # one cut per backoff window, not one per in-flight 429
+                self.limit = max(1, self.limit // 2)
+            self.pause_until = max(self.pause_until, now + wait)
+
+def prompt_key(prompt: str, a: argparse.Namespace) -> str:
+    return ResponseCache.key(prompt, model=a.model, n=a.n, max_tokens=a.max_t, temperature=a.temp, top_p=1)
+
+async def evaluate(i: int, item: Dict, tpl: str, a: argparse.Namespace, limiter: AdaptiveLimiter,
+                   cache: Optional[ResponseCache] = None) -> Tuple[int, Optional[Dict], Optional[Exception]]:
+    """Query one document with retries; returns (position, result or None, last error)."""
+    prompt, error = build_prompt(tpl, item["source"], item["system_output"]), None
+    key = cache and prompt_key(prompt, a)
+    cached = cache and cache.get(key)
+    if cached is not None: return i, {**item, "prompt": prompt, "responses": cached}, None   # no API call, no slot
+    for attempt in range(a.retries + 1):
+        wait = 0.0
+        async with limiter:
+            try:
+                responses = await query(prompt, model=a.model, n=a.n, max_toks=a.max_t, temp=a.temp)
+            except openai.error.RateLimitError as e:
+                error, wait = e, retry_after(e) or a.err_sleep * 2 ** attempt
+                await limiter.throttled(wait); continue
+            except Exception as e:
+                error, wait = e, a.err_sleep * 2 ** attempt
+            else:
+                await limiter.success()
+                if cache: cache.put(key, a.model, responses)
+                return i, {**item, "prompt": prompt, "responses": responses}, None
+        await asyncio.sleep(wait)   # outside the limiter, so the slot is free while we back off
+    return i, None, error
+
+async def run(a: argparse.Namespace, todo: List[Dict], tpl: str, ckpt: "Checkpoint",
+              cache: Optional[ResponseCache] = None) -> Tuple[int, AdaptiveLimiter]:
+    """Evaluate `todo`, appending each result to the checkpoint as soon as it completes.
+    With the cache on, items that build the same prompt are queried once and the
+    responses fanned out to all of them (without it, each draws its own samples)."""
+    limiter = AdaptiveLimiter(a.concurrency)
+    groups: Dict[str, List[int]] = {}
+    for i, item in enumerate(todo):
+        k = prompt_key(build_prompt(tpl, item["source"], item["system_output"]), a) if cache else str(i)
+        groups.setdefault(k, []).append(i)
+    shared = {ids[0]: ids for ids in groups.values()}
+    # openai 0.28 opens an aiohttp session per acreate() unless one is set: share one (keep-alive)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=a.concurrency)) as session:
+        openai.aiosession.set(session)   # ContextVar; the tasks below inherit it
+        tasks = [asyncio.create_task(evaluate(i, todo[i], tpl, a, limiter, cache)) for i in shared]
+        skipped = 0
+        with tqdm.tqdm(total=len(todo), desc="Eval", unit="doc") as bar:
+            for fut in asyncio.as_completed(tasks):
+                i, result, error = await fut
+                for j in shared[i]:
+                    if result is None: skipped += 1; print("skip", skipped, error)
+                    else:              ckpt.append(item_key(todo[j]), {**todo[j], "prompt": result["prompt"],
+                                                                       "responses": result["responses"]})
+                bar.update(len(shared[i]))
+    return skipped, limiter
+
+# ---- checkpoint ------------------------------------------------------------
+# Results are appended to <save_fp stem>.<run id>.jsonl as they complete (one line
+# per doc, O(1) I/O per result); a rerun skips the keys already in it, and compact()
+# turns it into the final pretty JSON in input order. The run id hashes everything
+# that shapes a response, so another template or model never resumes this file.
+def run_id(tpl: str, a: argparse.Namespace) -> str:
+    spec = {"template": tpl, "model": a.model, "n": a.n, "max_t": a.max_t, "temp": a.temp}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def item_key(item: Dict) -> str:
+    """Stable id of a document-summary pair: SummEval doc_id|system_id, else a content hash."""
+    if "doc_id" in item and "system_id" in item: return f"{item['doc_id']}|{item['system_id']}"
+    return hashlib.sha1(f"{item['source']}\0{item['system_output']}".encode("utf-8")).hexdigest()
+
+def checkpoint_path(save_fp: str, run: str) -> Path: return Path(save_fp).with_suffix(f".{run}.jsonl")
+
+def read_checkpoint(path: Path) -> Dict[str, Dict]:
+    """key → record for every complete line; a line torn by a crash is ignored (and redone)."""
+    records: Dict[str, Dict] = {}
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                try:    rec = json.loads(line)
+                except json.JSONDecodeError: continue
+                records[rec.pop("_key")] = rec
+    return records
+
+class Checkpoint:
+    def __init__(self, path: Path, sync_every: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        torn = path.exists() and path.stat().st_size and not path.read_bytes().endswith(b"\n")
+        self.f, self.sync_every, self.pending = path.open("a", encoding="utf-8"), sync_every, 0
+        if torn: self.f.write("\n")   # don't glue the next record onto a half-written line
+
+    def append(self, key: str, result: Dict) -> None:
+        self.f.write(json.dumps({"_key": key, **result}, ensure_ascii=False) + "\n"); self.f.flush()
+        self.pending += 1
+        if self.pending >= self.sync_every: os.fsync(self.f.fileno()); self.pending = 0
+
+    def close(self) -> None:
+        self.f.flush(); os.fsync(self.f.fileno()); self.f.close()
+
+def compact(path: Path, data: List[Dict], save_fp: str) -> int:
+    """Write the checkpointed results for `data` to save_fp as JSON, in input order."""
+    records = read_checkpoint(path)
+    results = [records[k] for k in (item_key(item) for item in data) if k in records]
+    Path(save_fp).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    return len(results)
+
 # ---- main ------------------------------------------------------------------
 def main(a: argparse.Namespace) -> None:
+    data     = load_json(Path(a.summeval_fp))
+    tpl      = read_text(Path(a.prompt_fp))
+    ckpt_fp  = checkpoint_path(a.save_fp, run_id(tpl, a))
+    if a.compact_only:
+        print(f"Compacted {compact(ckpt_fp, data, a.save_fp)} results → {a.save_fp}"); return
+
     dotenv.load_dotenv(".env", override=False)
     key = a.key or os.getenv("OPENROUTER_API_KEY")
     if not key:
         raise SystemExit("No API key ‑‑ pass --key or set OPENROUTER_API_KEY in .env")
 
     openai.api_key, openai.api_base = key, "https://openrouter.ai/api/v1"
-    data     = load_json(Path(a.summeval_fp))
-    tpl      = read_text(Path(a.prompt_fp))
-    results, skipped = [], 0
+    done     = set(read_checkpoint(ckpt_fp))          # index of completed item ids
+    todo     = [item for item in data if item_key(item) not in done]
+    if done: print(f"Resuming from {ckpt_fp}: {len(data) - len(todo)} done, {len(todo)} to go")
 
-    for i, item in enumerate(tqdm.tqdm(data, desc="Eval", unit="doc"), 1):
-        prompt = build_prompt(tpl, item["source"], item["system_output"])
-        try:
-            item["prompt"] = prompt
-            item["responses"] = query(prompt, model=a.model, n=a.n, max_toks=a.max_t, temp=a.temp)
-            results.append(item)
-        except Exception as e:
-            skipped += 1; print("skip", skipped, e); time.sleep(a.err_sleep); continue
-        if i % a.save_every == 0: Path(a.save_fp).write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    ckpt  = Checkpoint(ckpt_fp, a.save_every)
+    cache = None if a.no_cache else ResponseCache(Path(a.cache_fp), int(a.cache_max_mb * 2**20))
+    started = time.perf_counter()
+    try:
+        skipped, limiter = asyncio.run(run(a, todo, tpl, ckpt, cache))
+    finally:
+        ckpt.close()
+        if cache: cache.close()
+    elapsed = time.perf_counter() - started
 
-    Path(a.save_fp).write_text(json.dumps(results, indent=2, ensure_ascii=False))
-    print(f"Done. saved→{a.save_fp}  ignored={skipped}")
+    saved = compact(ckpt_fp, data, a.save_fp)
+    print(f"Done. saved {saved}→{a.save_fp}  ignored={skipped}  (rerun to retry ignored docs)")
+    print(f"{len(todo)} docs in {elapsed:.1f}s ({len(todo) / max(elapsed, 1e-9):.2f} docs/s)  "
+          f"concurrency={a.concurrency}→{limiter.limit}  429s={limiter.throttles}")
+    if cache: print(cache.summary())
 
 def cli() -> argparse.Namespace:
     p = argparse.ArgumentParser()
@@ -61,8 +259,14 @@ def cli() -> argparse.Namespace:
     p.add_argument("--max_t",type=int,   default=5,    help="max_tokens")
     p.add_argument("--temp", type=float, default=2.0,  help="temperature")
     p.add_argument("--sleep",      type=float, default=0.5)
-    p.add_argument("--err_sleep",  type=float, default=2.0)
-    p.add_argument("--save_every", type=int,   default=50)
+    p.add_argument("--err_sleep",  type=float, default=2.0, help="base backoff; doubles per retry")
+    p.add_argument("--retries",    type=int,   default=3,   help="retries per doc (429s and errors)")
+    p.add_argument("--concurrency",type=int,   default=8,   help="max requests in flight; halved on 429")
+    p.add_argument("--save_every", type=int,   default=50,  help="fsync the .jsonl checkpoint every N results")
+    p.add_argument("--compact_only", action="store_true", help="only rebuild save_fp from the checkpoint of this template/model/params")
+    p.add_argument("--cache_fp",   default="results/prompt_cache.sqlite", help="prompt→responses cache")
+    p.add_argument("--cache_max_mb", type=float, default=256, help="evict least recently used entries beyond this")
+    p.add_argument("--no_cache",   action="store_true", help="always query (e.g. to draw fresh samples at temp>0)")
     return p.parse_args()
 
 if __name__ == "__main__":
@@ -33,4 +33,10 @@ GPT4O_MINI=model_confi(model="openai/gpt-4o-mini",system_content= "You are a fit
 
 default_model=GPT4O_MINI
 
-logger.info("confi ended")
\ No newline at end of file
+logger.info("confi ended")
+
+
+# ── 3. Sessions ──
+# Conversations are kept in memory per session (app/sessions.py)
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))   # least recently used beyond this are dropped
+MAX_TURNS = int(os.getenv("MAX_TURNS", "20"))           # user/assistant pairs kept per session
\ No newline at end of file
@@ -2,17 +2,17 @@
 from app.logger import logger
 logger.info("main started")
 
-from fastapi import FastAPI 
+from fastapi import FastAPI, Request, Response
 from app.openrouter_client import assistant
+from app.sessions import store
+from uuid import uuid4
 import uvicorn
 import app.config 
 # import asyncio
 
 
-#---------------meassages list for storing history and massage
-messages=[                                   
-          {"role": "system", "content": app.config.default_model.system_content},
-        ]
+#---------------history is kept per session (cookie), see app/sessions.py
+SESSION_COOKIE = "session_id"
 
 
 #---------------FastAPI app-------------------
@@ -23,15 +23,21 @@ async def chatbot():
       return "Here, I am to help you out by answering your questions"
     
 @app.post("/chatbot/chat")
-async def chat(query:str):
+async def chat(query:str, request: Request, response: Response):
   
-    messages.append({"role":"user","content":query})
-    
-    logger.info("OpenRouter assistant starting")
-    result = await assistant(messages)
-    print(result)
-    
-    messages.append({"role": "assistant",  "content":result})
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        session_id = str(uuid4())
+        response.set_cookie(key=SESSION_COOKIE, value=session_id, httponly=True, samesite="lax")
+
+    conversation = store.get(session_id)
+    async with conversation.lock:
+        logger.info("OpenRouter assistant starting")
+        result = await assistant(conversation.prompt(query))
+
+        # a question that got no answer is not kept
+        if result is not None:
+            conversation.add_turn(query, result)
     
     logger.info("OpenRouter assistant ended")
     return result
@@ -1,21 +1,28 @@
 from app.logger import logger
 logger.info("openrouter started")
-from openai import OpenAI
+from openai import AsyncOpenAI
 import app.config 
 
 
+#Credential for openAI: one async client (and connection pool) shared by every request
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        client = AsyncOpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=app.config.get_api_key(),
+        )
+    return client
+
 
 #Model
 async def assistant(messages:list):
     logger.debug("call to assistant")
-    #Credential for openAI
-    client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=app.config.get_api_key(),
-    )
     
     try:
-        response = client.chat.completions.create(       
+        response = await get_client().chat.completions.create(       
             model=app.config.default_model.model,            
             messages=messages,
         )
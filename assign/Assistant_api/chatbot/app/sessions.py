@@ -0,0 +1,65 @@
+from app.logger import logger
+logger.info("sessions started")
+
+import asyncio
+from collections import OrderedDict
+import app.config
+
+
+#---------------one conversation per session------------------
+class Conversation:
+    def __init__(self, system_content: str, max_turns: int):
+        self.messages = [{"role": "system", "content": system_content}]
+        self.max_turns = max_turns
+        self.lock = asyncio.Lock()   # one turn at a time per session
+
+    def prompt(self, query: str) -> list:
+        """Messages to send for `query`; the history only changes once it is answered."""
+        return self.messages + [{"role": "user", "content": query}]
+
+    def add_turn(self, query: str, reply: str):
+        self.messages.append({"role": "user", "content": query})
+        self.messages.append({"role": "assistant", "content": reply})
+        # keep the system prompt + the newest `max_turns` user/assistant pairs
+        # (whole pairs only, so the history never starts with an orphaned reply)
+        overflow = len(self.messages) - 1 - 2 * self.max_turns
+        if overflow > 0:
+            del self.messages[1:1 + overflow]
+
+
+#---------------LRU store of conversations------------------
+class SessionStore:
+    """
+    In-memory conversations keyed by session id. Memory stays bounded:
+    at most `max_sessions` conversations (least recently used is dropped)
+    of at most `max_turns` turns each.
+    """
+
+    def __init__(self, max_sessions: int, max_turns: int, system_content: str):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.system_content = system_content
+        self.sessions: OrderedDict[str, Conversation] = OrderedDict()
+
+    def get(self, session_id: str) -> Conversation:
+        conversation = self.sessions.get(session_id)
+        if conversation is None:
+            conversation = self.sessions[session_id] = Conversation(self.system_content, self.max_turns)
+            while len(self.sessions) > self.max_sessions:
+                evicted, _ = self.sessions.popitem(last=False)
+                logger.debug("evicted session %s", evicted)
+        else:
+            self.sessions.move_to_end(session_id)
+        return conversation
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+store = SessionStore(
+    max_sessions=app.config.MAX_SESSIONS,
+    max_turns=app.config.MAX_TURNS,
+    system_content=app.config.default_model.system_content,
+)
+
+logger.info("sessions ended")
@@ -1,15 +1,21 @@
-from app.core.logger import logger
+from app.core.logger import logger, Lazy, summarize_messages
 logger.info("api/chatbot enter")
-from app.services.openrouter_client import assistant
+from app.services.model_router import route_completion, route_stream, router_stats
 import app.core.config
-from app.schemas.chatbot import Createchat
-from app.db.crud import update_chat,get_chat_by_session
-from app.db.mango import db
+from app.schemas.chatbot import Createchat, ChatWindow
+from app.services.context_builder import build_context, schedule_fold
+from app.services.response_cache import cached_reply, response_cache
+from app.db.crud import append_messages,get_chat_by_session,VersionConflict,record_usage,get_usage,get_messages_page
+from app.services.rate_limit import rate_limit, enforce_quota, client_ip
+from app.services.session_guard import session_turn, coalesce
 
 
-from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi import APIRouter, Request, Response, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from uuid import uuid4
+from contextlib import aclosing
 from pydantic import BaseModel
+import json
 
 # import asyncio
 
@@ -27,6 +33,57 @@ router = APIRouter(
 class ChatInput(BaseModel):
     query: str
 
+
+def set_session_cookie(response: Response, session_id: str):
+    response.set_cookie(
+        key=SESSION_COOKIE,
+        value=session_id,
+        httponly=True,
+        samesite="lax",
+        secure=False,   # switch to True on HTTPS
+        path="/"
+    )
+
+
+async def load_messages(session_id: str) -> ChatWindow:
+    """
+    Newest stored messages with the system prompt first, plus the rolling summary.
+
+    At least CHAT_HISTORY_MESSAGES are loaded, and always everything after the
+    summary: a message that left the window before the token budget dropped
+    it would otherwise be neither sent nor folded into the summary.
+    """
+    system = {"role": "system", "content": app.core.config.default_model.system_content}
+    try:
+        history_messages = app.core.config.CHAT_HISTORY_MESSAGES
+        chat =await get_chat_by_session(session_id, last_n=history_messages)
+        total = chat.get("message_count", len(chat["messages"]))
+        covered = max(1, chat.get("summary_upto", 0))   # index 0 is the system prompt
+        if history_messages and total - len(chat["messages"]) > covered:
+            chat =await get_chat_by_session(session_id, last_n=total - covered)
+        messages = chat["messages"]
+        if messages and messages[0].get("role") == "system":
+            first_index = 1
+        else:
+            messages.insert(0, system)   # system prompt fell outside the slice
+            first_index = max(1, total - (len(messages) - 1))
+        return ChatWindow(
+            messages=messages,
+            new_from=len(messages),
+            first_index=first_index,
+            summary=chat.get("summary", ""),
+            summary_upto=chat.get("summary_upto", 0),
+            version=chat.get("message_count", 0),
+        )
+    except Exception as e:
+        logger.warning("Falling back to new chat: %s", e)
+        return ChatWindow(messages=[system], new_from=0)
+
+
+def sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 #--------------------2. chatbot routes -------------------------------------------------
 
 
@@ -34,70 +91,219 @@ class ChatInput(BaseModel):
 async def chatbot():
       return "Here, I am to help you out by answering your questions"
     
-@router.post("/chat")
-async def chat(input: ChatInput,request: Request, response: Response):
-
-    logger.info("api/chatbot Post /chat entered")
-    
-    # 1. Get Session_id from cookie
-    session_id=request.cookies.get(SESSION_COOKIE)
-    print(session_id)
-    if not session_id:
-        session_id = str(uuid4())
-        response.set_cookie(
-            key=SESSION_COOKIE,
-            value=session_id,
-            httponly=True,
-            samesite="lax",
-            secure=False,   # switch to True on HTTPS
-            path="/"
-        )
-          
-          
+async def chat_turn(session_id: str, query: str, ip: str | None = None) -> dict:
+    """
+    Load history, get the reply and append the turn. Runs under session_turn,
+    and the append is conditional on the version seen at load time.
+    """
     # 2. Load existing chat if any
-    try:
-        chat =await get_chat_by_session(session_id)
-        messages=chat["messages"]
-    except Exception as e:
-        logger.warning("Falling back to new chat: %s", e)
-        messages = [
-            {"role": "system", "content": app.core.config.default_model.system_content},
-        ]
+    window = await load_messages(session_id)
+    messages = window.messages
   
-    # 3. Add user query to messages
-    messages.append({"role": "user", "content": input.query})
-    print(messages)
+    # 3. Add user query to messages and fit the history into the token budget
+    messages.append({"role": "user", "content": query})
+    context, to_fold, fold_upto = build_context(window)
+    logger.debug("Context for %s: %s", session_id, Lazy(summarize_messages, context))
     # 4. Get assistant response
-    logger.info("OpenRouter assistant starting")
-    try:
-        result = await assistant(messages)
-        print(result)
-    except Exception:
-        logger.exception("Assistant Error")
-        raise HTTPException(status_code=500,detail="AI failed")
+    result, store = await cached_reply(context)
+    if result is None:
+        await enforce_quota(session_id, ip)   # cached replies cost no credits
+        logger.info("OpenRouter assistant starting")
+        usage = {}
+        try:
+            result, model = await route_completion(context, usage=usage)
+            logger.info("Reply from %s", model)
+        except Exception:
+            logger.exception("Assistant Error")
+            raise HTTPException(status_code=500,detail="AI failed")
+        finally:
+            await record_usage(session_id, usage, ip)
+        store(result, model)
     
     messages.append({"role": "assistant",  "content":result})
     
     
-    # 5. Create chat object and update DB
+    # 5. Create chat object with only this turn's messages and append to DB
     chat_data=Createchat(
         session_id=session_id,
-        messages=messages
+        messages=messages[window.new_from:]
     )
 
     try:
-        update=await update_chat(chat_data)
+        update=await append_messages(chat_data, expected_count=window.version)
+    except VersionConflict:
+        raise HTTPException(status_code=409, detail="Chat was updated by another request, please resend")
     except :
         logger.exception("Update chat failed")
         raise HTTPException(status_code=500, detail="DB write error")
 
+    # 6. Fold turns that no longer fit into the rolling summary (background)
+    if to_fold and update is not None:
+        schedule_fold(session_id, window.summary, to_fold, fold_upto, ip)
+
+    return {"reply": result, "update": update}
+
+
+@router.get("/history")
+async def history(request: Request,
+                  before: int | None = Query(None, ge=1, description="next_cursor of the previous page"),
+                  limit: int = Query(30, ge=1, le=100)):
+    """
+    Page backwards through the session's messages, newest page first. Pass the
+    returned `next_cursor` as `before` to load older messages; it is null once
+    the start of the chat is reached. System messages are not returned.
+    """
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        return {"messages": [], "next_cursor": None, "total": 0}
+
+    page = await get_messages_page(session_id, before, limit)
+    if page is None:
+        return {"messages": [], "next_cursor": None, "total": 0}
+
+    start, messages, total = page
+    return {
+        "messages": [
+            {"index": start + offset, "role": m["role"], "content": m.get("content")}
+            for offset, m in enumerate(messages) if m.get("role") != "system"
+        ],
+        "next_cursor": start if start > 0 else None,
+        "total": total,
+    }
+
+
+@router.post("/chat", dependencies=[Depends(rate_limit)])
+async def chat(input: ChatInput,request: Request, response: Response):
+
+    logger.info("api/chatbot Post /chat entered")
+    
+    # 1. Get Session_id from cookie
+    session_id=request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        session_id = str(uuid4())
+        set_session_cookie(response, session_id)
+          
+    # 2-6. One turn at a time per session; a duplicate in-flight POST shares the result
+    async def run():
+        async with session_turn(session_id):
+            return await chat_turn(session_id, input.query, client_ip(request))
+
+    turn = await coalesce(session_id, input.query, run)
+
     logger.info("api/chatbot POST /chat completed")
     
     return {
-        "reply": result,
+        "reply": turn["reply"],
         "session_id": session_id,
-        "update":update,
+        "update":turn["update"],
     }
 
+
+@router.post("/chat/stream", dependencies=[Depends(rate_limit)])
+async def chat_stream(input: ChatInput, request: Request):
+    """
+    Same turn as /chat, but tokens are forwarded as Server-Sent Events while the
+    model generates them. Events: `data: {"delta": ...}` per chunk, then
+    `event: done` (after the turn is saved) or `event: error`.
+    """
+    logger.info("api/chatbot Post /chat/stream entered")
+
+    # 1. Get Session_id from cookie
+    session_id = request.cookies.get(SESSION_COOKIE)
+    new_session = not session_id
+    if new_session:
+        session_id = str(uuid4())
+
+    # 2. Hold the session for the whole stream so turns stay in order
+    async def event_stream():
+        try:
+            async with session_turn(session_id):
+                async for event in stream_turn(session_id, input.query, client_ip(request)):
+                    yield event
+        except HTTPException as e:
+            yield sse({"detail": e.detail}, event="error")
+
+    stream = StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    if new_session:
+        set_session_cookie(stream, session_id)
+    return stream
+
+
+async def stream_turn(session_id: str, query: str, ip: str | None = None):
+    # 3. Load history and add the user query
+    window = await load_messages(session_id)
+    messages = window.messages
+    messages.append({"role": "user", "content": query})
+    context, to_fold, fold_upto = build_context(window)
+
+    # 4. Stream the reply, then persist the full turn
+    parts = []
+    cached, store = await cached_reply(context)
+    if cached is not None:
+        parts.append(cached)
+        yield sse({"delta": cached})
+    else:
+        await enforce_quota(session_id, ip)
+        usage, served = {}, {}
+        try:
+            # aclosing: a client that goes away closes route_stream (which
+            # estimates the unfinished call) before the usage is recorded below
+            async with aclosing(route_stream(context, usage=usage, served=served)) as deltas:
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield sse({"delta": delta})
+        except Exception:
+            logger.exception("Assistant stream error")
+            yield sse({"detail": "AI failed"}, event="error")
+            return
+        finally:
+            await record_usage(session_id, usage, ip)
+        store("".join(parts), served["model"])
+
+    messages.append({"role": "assistant", "content": "".join(parts)})
+    try:
+        update = await append_messages(Createchat(session_id=session_id, messages=messages[window.new_from:]),
+                                       expected_count=window.version)
+    except VersionConflict:
+        yield sse({"detail": "Chat was updated by another request, please resend"}, event="error")
+        return
+    if update is None:
+        yield sse({"detail": "DB write error"}, event="error")
+        return
+    if to_fold:
+        schedule_fold(session_id, window.summary, to_fold, fold_upto, ip)
+    logger.info("api/chatbot POST /chat/stream completed")
+    yield sse({"session_id": session_id, "update": update}, event="done")
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Response cache size and hit-rate counters."""
+    return response_cache.snapshot()
+
+
+@router.get("/models/stats")
+async def model_stats():
+    """Per-model latency histograms, errors and hedges (for tuning the routing config)."""
+    return router_stats()
+
+
+@router.get("/usage")
+async def session_usage(request: Request):
+    """Today's token usage and the remaining quota for the caller's session."""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Session ID missing")
+    usage = await get_usage(session_id)
+    quota = app.core.config.SESSION_DAILY_TOKEN_QUOTA
+    usage["quota"] = quota or None
+    usage["remaining"] = max(0, quota - usage.get("total_tokens", 0)) if quota else None
+    usage.pop("updated_at", None)
+    return usage
+
         
 logger.info("api/chatbot out")
\ No newline at end of file
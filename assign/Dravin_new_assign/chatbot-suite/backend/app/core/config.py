@@ -14,7 +14,6 @@ logger.debug("OPENROUTER_API_KEY (first 8 chars): %s",
 
 def get_api_key():
     try:
-      print(os.getenv("OPENROUTER_API_KEY"))
       return os.getenv("OPENROUTER_API_KEY")    
     except KeyError:
       logger.critical("OPENROUTER_API_KEY not found in .env — shutting down.")
@@ -32,13 +31,31 @@ class model_confi(BaseModel):
     max_tokens: int = 1024
     stream: bool = False
 
+    # Routing (see services/model_router.py)
+    max_prompt_tokens: int = 128000
+
 #-----------------------3. different models--------------
-GPT4O_MINI=model_confi(model="openai/gpt-4o-mini",system_content= "You are a good assistant, you answer the question very precisely")
+SYSTEM_CONTENT = "You are a good assistant, you answer the question very precisely"
+
+GPT4O_MINI=model_confi(model="openai/gpt-4o-mini",system_content=SYSTEM_CONTENT)
+GEMINI_FLASH=model_confi(model="google/gemini-2.0-flash-001",system_content=SYSTEM_CONTENT,max_prompt_tokens=1000000)
+CLAUDE_HAIKU=model_confi(model="anthropic/claude-3.5-haiku",system_content=SYSTEM_CONTENT,max_prompt_tokens=200000)
 
 
 #-----------------------4. Default model-----------------
 default_model=GPT4O_MINI
 
+
+#-----------------------5. Model routing-----------------
+# Tried in this order (different providers, so a hedge/fallback avoids a shared outage);
+# models whose observed p95 misses ROUTER_LATENCY_SLO_MS are moved to the back
+MODEL_ROUTES=[GPT4O_MINI, GEMINI_FLASH, CLAUDE_HAIKU]
+ROUTER_LATENCY_SLO_MS = float(os.getenv("ROUTER_LATENCY_SLO_MS", "4000"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "20"))     # before a model's p95 is trusted
+# Seconds before a slow call is hedged to the next model; off by default since a hedge
+# pays for a second completion. Set it above the primary model's p95 from /models/stats.
+ROUTER_HEDGE_AFTER = float(os.getenv("ROUTER_HEDGE_AFTER", "0"))   # 0 disables hedging
+
 logger.info("core/config out")
 
 
@@ -49,4 +66,63 @@ def get_mango_uri():
       return os.getenv("MONGO_URI")
     except KeyError:
       logger.critical("MONGO_URI not found in .env — shutting down.")
-      raise SystemExit(1)
\ No newline at end of file
+      raise SystemExit(1)
+
+
+#--------------------Mongo client------------
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Chats untouched for this many days are removed by the TTL index on updated_at (0 = keep forever)
+CHAT_TTL_DAYS = int(os.getenv("CHAT_TTL_DAYS", "30"))
+
+
+#--------------------Session guard----------
+# Turns of one session run one at a time; further concurrent turns beyond this get 429
+SESSION_MAX_QUEUED = int(os.getenv("SESSION_MAX_QUEUED", "4"))
+
+
+#--------------------Rate limits / quota-----
+# Token buckets per client IP and per session cookie (requests per minute + burst)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_SESSION_PER_MINUTE = float(os.getenv("RATE_LIMIT_SESSION_PER_MINUTE", "10"))
+RATE_LIMIT_SESSION_BURST = float(os.getenv("RATE_LIMIT_SESSION_BURST", "5"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "60"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+# Model tokens (prompt + completion, from response.usage) a session may use per UTC day; 0 = unlimited
+SESSION_DAILY_TOKEN_QUOTA = int(os.getenv("SESSION_DAILY_TOKEN_QUOTA", "200000"))
+# Same per client IP, so dropping the cookie does not reset the quota (NAT'd users share it); 0 = unlimited
+IP_DAILY_TOKEN_QUOTA = int(os.getenv("IP_DAILY_TOKEN_QUOTA", "1000000"))
+# Usage documents untouched for this many days are removed by a TTL index (0 = keep forever)
+USAGE_TTL_DAYS = int(os.getenv("USAGE_TTL_DAYS", "7"))
+
+
+#--------------------Chat history-----------
+# Messages loaded from Mongo per turn (newest N via a $slice projection; more
+# when needed to reach the end of the rolling summary)
+CHAT_HISTORY_MESSAGES = int(os.getenv("CHAT_HISTORY_MESSAGES", "40"))
+# Prompt tokens sent to the model; older turns beyond it are folded into a summary
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+
+#--------------------OpenRouter client-------
+# Shared AsyncOpenAI/httpx client settings (see services/openrouter_client.py)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "100"))
+OPENROUTER_MAX_KEEPALIVE = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "20"))
+OPENROUTER_KEEPALIVE_EXPIRY = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "30"))
+OPENROUTER_CONCURRENCY = int(os.getenv("OPENROUTER_CONCURRENCY", "50"))   # in-flight model calls
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+OPENROUTER_READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "60"))
+OPENROUTER_MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", "2"))
+
+
+#--------------------Response cache----------
+# Standalone questions (system prompt + one user message) are answered from cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 60 * 60)))
+# Set to an embedding model (e.g. openai/text-embedding-3-small) to enable the similarity tier
+RESPONSE_CACHE_EMBED_MODEL = os.getenv("RESPONSE_CACHE_EMBED_MODEL") or None
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
\ No newline at end of file
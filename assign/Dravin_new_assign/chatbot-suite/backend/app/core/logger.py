@@ -1,14 +1,95 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+import queue
+import random
 
 LOG_FILE="log/app.log"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")                              # "text" or "json"
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))  # share of DEBUG records kept
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
 
 os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 
+
+#----------------------1. Lazy values----------------------
+class Lazy:
+    """
+    Defer an expensive log argument until a handler actually formats it:
+        logger.debug("chat %s", Lazy(summarize_chat, chat))
+    Nothing is computed when DEBUG is disabled or the record is sampled out.
+    """
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+        return str(self.fn(*self.args))
+
+    __repr__ = __str__
+
+
+def summarize_messages(messages: list[dict]) -> dict:
+    """Constant-size description of a message list (never the full contents)."""
+    return {
+        "count": len(messages),
+        "roles": [m.get("role") for m in messages[-4:]],
+        "chars": sum(len(m.get("content") or "") for m in messages),
+    }
+
+
+#----------------------2. Filters / formatters--------------
+class SamplingFilter(logging.Filter):
+    """Keep a random share of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class CappingQueueHandler(QueueHandler):
+    """
+    Format on the caller (so Lazy args see live objects), cap the message size,
+    then hand the record to the listener thread, which does the file/console I/O.
+    """
+
+    def __init__(self, log_queue, max_chars: int):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+
+    def prepare(self, record):
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} chars truncated]"
+        record.msg, record.args = message, None   # tracebacks are appended below, uncapped
+        return super().prepare(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+#----------------------3. Logger setup----------------------
 # Basic logger setup
 logger = logging.getLogger("chatbot")
-logger.setLevel(logging.DEBUG) 
+logger.setLevel(LOG_LEVEL)
 
 # File handler with rotation
 file_handler = RotatingFileHandler(LOG_FILE, maxBytes=1000000, backupCount=3)
@@ -19,14 +100,36 @@ console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.INFO)
 
 # Format
-formatter = logging.Formatter(
-    "[%(asctime)s] [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+if LOG_FORMAT == "json":
+    formatter = JsonFormatter(datefmt="%Y-%m-%d %H:%M:%S")
+else:
+    formatter = logging.Formatter(
+        "[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
 
 file_handler.setFormatter(formatter)
 console_handler.setFormatter(formatter)
 
+# Requests only enqueue records; a background listener thread writes them
+log_queue = queue.SimpleQueue()
+queue_handler = CappingQueueHandler(log_queue, LOG_MAX_MESSAGE_CHARS)
+queue_handler.addFilter(SamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+
 # Attach handlers
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
\ No newline at end of file
+logger.addHandler(queue_handler)
+logger.propagate = False
+listener.start()
+_listening = True
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread (safe to call twice)."""
+    global _listening
+    if _listening:
+        _listening = False
+        listener.stop()
+
+
+atexit.register(stop_logging)
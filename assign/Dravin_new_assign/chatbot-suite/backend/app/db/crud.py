@@ -1,69 +1,211 @@
-from app.core.logger import logger
+from app.core.logger import logger, Lazy, summarize_messages
 logger.info("db/crud enter")
-from app.db.mango import db
+from app.db.mango import get_db
 from app.schemas.chatbot import Createchat
 
 from datetime import datetime, timezone
-from uuid import uuid4
-from bson import ObjectId
 from fastapi import HTTPException
-from bson import json_util  
-import json
 
 
-async def get_chat_by_session(session_id: str):
+async def get_chat_by_session(session_id: str, last_n: int | None = None):
     """
     Return the chat document for `session_id` or raise 404.
+    With `last_n`, only the newest `last_n` messages are fetched ($slice projection).
     """
     if not session_id:
         logger.warning("get_chat_by_session called with empty session_id")
         raise HTTPException(status_code=400, detail="Session ID missing")
 
-    chat = await db.chats.find_one({"session_id": session_id})
+    projection = {"messages": {"$slice": -last_n}} if last_n else None
+    chat = await get_db().chats.find_one({"session_id": session_id}, projection)
+    if chat is not None and "message_count" not in chat:
+        # Stored before message_count existed (and not yet migrated at startup)
+        await backfill_message_count(session_id)
+        chat = await get_db().chats.find_one({"session_id": session_id}, projection)
 
     if chat is None:
-        logger.info(f"No chat found for session_id={session_id!r}")
+        logger.info("No chat found for session_id=%r", session_id)
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    chat_pretty = json.dumps(chat, default=json_util.default, indent=2)
-    logger.debug("Chat document for %s:\n%s", session_id, chat_pretty)
+    logger.debug("Chat loaded for %s: %s", session_id, Lazy(summarize_messages, chat["messages"]))
     return chat
 
 
-async def update_chat( chat: Createchat):
-    
-    logger.info("I enter the update messages")
-    
-    now = datetime.now(timezone.utc)
+async def get_messages_page(session_id: str, before: int | None, limit: int):
+    """
+    One page of stored messages, newest first page when `before` is None.
+
+    Messages are addressed by their position in the array (stable, since turns
+    are only ever appended). Returns (start, messages, total) where `messages`
+    are positions [start, start + len(messages)), or None if there is no chat.
+    Only the page is read from Mongo ($slice projection), never the whole array.
+    """
+    chats = get_db().chats
+    if before is None:
+        projection = {"messages": {"$slice": -limit}, "message_count": 1, "_id": 0}
+    else:
+        start = max(0, before - limit)   # before >= 1, so the slice is never empty
+        projection = {"messages": {"$slice": [start, before - start]}, "message_count": 1, "_id": 0}
+
+    chat = await chats.find_one({"session_id": session_id}, projection)
+    if chat is not None and "message_count" not in chat:
+        await backfill_message_count(session_id)
+        chat = await chats.find_one({"session_id": session_id}, projection)
+    if chat is None:
+        return None
+    messages = chat.get("messages", [])
+    total = chat["message_count"]
+    if before is None:
+        start = total - len(messages)
+    return start, messages, total
+
+
+async def backfill_message_count(session_id: str | None = None) -> int:
+    """
+    Set message_count from the array size on chats stored before the counter
+    existed (all of them at startup, or one session on first load). $inc on
+    the next append would otherwise count from zero, and message_count is both
+    the version and the history cursor.
+    """
+    filter_ = {"message_count": {"$exists": False}}
+    if session_id:
+        filter_["session_id"] = session_id
+    result = await get_db().chats.update_many(
+        filter_, [{"$set": {"message_count": {"$size": {"$ifNull": ["$messages", []]}}}}]
+    )
+    if result.modified_count:
+        logger.info("Backfilled message_count on %d chats", result.modified_count)
+    return result.modified_count
+
 
+def build_append_ops(chat: Createchat, now: datetime) -> dict:
     # ------------------------------------------------------------------ #
     #  Build the upsert
-    #    - filter  : match by session_id only
-    #    - $set    : always overwrite messages + updated_at
+    #    - $push   : append only this turn's messages (write size stays
+    #                constant instead of growing with the conversation)
+    #    - $inc    : message_count doubles as the next sequence number
+    #    - $set    : updated_at
     #    - $setOnInsert : created_at only on first insert
     # ------------------------------------------------------------------ #
-    filter_ = {"session_id": chat.session_id}
-
-    update_ops = {
+    return {
+        "$push": {
+            "messages": {"$each": chat.messages},
+        },
+        "$inc": {
+            "message_count": len(chat.messages),
+        },
         "$set": {
-            "messages":   chat.messages,
             "updated_at": now,
         },
         "$setOnInsert": {
             "created_at": now,
         },
     }
+
+
+class VersionConflict(Exception):
+    """The chat changed since it was loaded (another turn was saved first)."""
+
+
+def version_filter(session_id: str, expected_count: int) -> dict:
+    # message_count is the document version; 0 means "no messages stored yet",
+    # which a chat without the counter but with messages must not match
+    if expected_count:
+        return {"session_id": session_id, "message_count": expected_count}
+    return {"session_id": session_id, "messages.0": {"$exists": False}}
+
+
+async def append_messages( chat: Createchat, expected_count: int | None = None):
+    """
+    Append `chat.messages` (the new messages of this turn) to the session's chat.
+
+    With `expected_count` (the message_count seen when the history was loaded)
+    the write only applies if nobody appended in between; otherwise
+    VersionConflict is raised. A stale filter misses the stored doc, so the
+    upsert tries to insert and the unique session_id index rejects it.
+    """
+    logger.info("I enter the append messages")
+    from pymongo.errors import DuplicateKeyError   # pymongo is loaded with the client, not at import
+    
+    now = datetime.now(timezone.utc)
+
+    update_ops = build_append_ops(chat, now)
     try:
-        result =await db.chats.update_one(filter_, update_ops, upsert=True)
-        logger.info(f"Chat upserted for session_id={chat.session_id}")
+        if expected_count is not None:
+            try:
+                result =await get_db().chats.update_one(version_filter(chat.session_id, expected_count), update_ops, upsert=True)
+            except DuplicateKeyError:
+                raise VersionConflict(chat.session_id)
+        else:
+            filter_ = {"session_id": chat.session_id}
+            try:
+                result =await get_db().chats.update_one(filter_, update_ops, upsert=True)
+            except DuplicateKeyError:
+                # Two first turns raced to insert the session; the loser now matches the winner's doc
+                result =await get_db().chats.update_one(filter_, update_ops, upsert=True)
+        logger.info("Chat upserted for session_id=%s", chat.session_id)
         return {
         "matched_count": result.matched_count,
         "modified_count": result.modified_count,
         "upserted_id": str(result.upserted_id) if result.upserted_id else None
          }
+    except VersionConflict:
+        logger.warning("Version conflict appending to session_id=%s", chat.session_id)
+        raise
     except Exception:
         logger.exception("Failed to upsert chat")
         return None
     
     
+async def save_summary(session_id: str, summary: str, summary_upto: int):
+    """
+    Store the rolling summary; never overwrite a summary that already covers more.
+    """
+    filter_ = {
+        "session_id": session_id,
+        "$or": [{"summary_upto": {"$lt": summary_upto}}, {"summary_upto": {"$exists": False}}],
+    }
+    try:
+        result = await get_db().chats.update_one(filter_, {"$set": {"summary": summary, "summary_upto": summary_upto}})
+        return result.modified_count
+    except Exception:
+        logger.exception("Failed to save summary")
+        return None
+
+
+#------------------------Usage accounting---------------------
+
+def usage_day(now: datetime | None = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+
+async def record_usage(session_id: str, usage: dict, ip: str | None = None):
+    """Add one model call's token counts to today's usage of the session and of the client IP."""
+    if not usage:
+        return
+    now = datetime.now(timezone.utc)
+    inc = {name: usage.get(name, 0) for name in ("prompt_tokens", "completion_tokens", "total_tokens")}
+    inc["requests"] = 1
+    counters = [(get_db().usage, {"session_id": session_id, "day": usage_day(now)})]
+    if ip:
+        counters.append((get_db().ip_usage, {"ip": ip, "day": usage_day(now)}))
+    for collection, key in counters:
+        try:
+            await collection.update_one(key, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True)
+        except Exception:
+            logger.exception("Failed to record usage for %s", key)
+
+
+async def get_usage(session_id: str) -> dict:
+    """Today's token usage for the session (zeros if none yet)."""
+    doc = await get_db().usage.find_one({"session_id": session_id, "day": usage_day()}, {"_id": 0})
+    return doc or {"session_id": session_id, "day": usage_day(), "total_tokens": 0, "requests": 0}
+
+
+async def get_ip_usage(ip: str) -> dict:
+    """Today's token usage of every session from this client IP (zeros if none yet)."""
+    doc = await get_db().ip_usage.find_one({"ip": ip, "day": usage_day()}, {"_id": 0})
+    return doc or {"ip": ip, "day": usage_day(), "total_tokens": 0, "requests": 0}
+
+
 logger.info("db/crud out")
\ No newline at end of file
@@ -2,10 +2,98 @@ from app.core.logger import logger
 logger.info("mango enter")
 import app.core.config 
 
-import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+cfg = app.core.config
+DB_NAME = "chatbot_db"
 
-client = AsyncIOMotorClient(app.core.config.get_mango_uri())
-db = client["chatbot_db"]
+# Built on first use (lifespan startup, or the first query in scripts/tests):
+# importing motor/pymongo costs ~100ms of cold start and is deferred until then
+_client = None
+_db = None
 
-logger.info("mango out")
\ No newline at end of file
+
+def get_client():
+    global _client, _db
+    if _client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _client = AsyncIOMotorClient(
+            cfg.get_mango_uri(),
+            maxPoolSize=cfg.MONGO_MAX_POOL_SIZE,
+            minPoolSize=cfg.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=cfg.MONGO_MAX_IDLE_MS,
+            serverSelectionTimeoutMS=cfg.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        )
+        _db = _client[DB_NAME]
+    return _client
+
+
+def get_db():
+    if _db is None:
+        get_client()
+    return _db
+
+
+#------------------------Indexes---------------------
+TTL_INDEX = "updated_at_ttl"
+
+
+async def ensure_indexes(database=None):
+    """
+    Create the indexes every request relies on (idempotent, run at startup):
+      - unique session_id : find_one/update_one({"session_id": ...}) is an index lookup
+      - TTL on updated_at : chats idle for CHAT_TTL_DAYS are removed by mongod
+      - unique (session_id, day) on usage, (ip, day) on ip_usage : quota lookups and $inc upserts
+      - TTL on usage/ip_usage updated_at : daily counters older than USAGE_TTL_DAYS go
+    """
+    from pymongo import ASCENDING
+
+    database = database if database is not None else get_db()
+    chats = database.chats
+    await chats.create_index([("session_id", ASCENDING)], name="session_id_unique", unique=True)
+    # usage / ip_usage: one document per session / client IP per UTC day (services/rate_limit.py)
+    await database.usage.create_index([("session_id", ASCENDING), ("day", ASCENDING)],
+                                      name="session_day_unique", unique=True)
+    await database.ip_usage.create_index([("ip", ASCENDING), ("day", ASCENDING)],
+                                         name="ip_day_unique", unique=True)
+
+    await ensure_ttl(chats, cfg.CHAT_TTL_DAYS)
+    await ensure_ttl(database.usage, cfg.USAGE_TTL_DAYS)
+    await ensure_ttl(database.ip_usage, cfg.USAGE_TTL_DAYS)
+    logger.info("Mongo indexes ready (chat TTL %s days, usage TTL %s days)", cfg.CHAT_TTL_DAYS, cfg.USAGE_TTL_DAYS)
+
+
+async def ensure_ttl(collection, days: int):
+    """TTL index on updated_at; a changed `days` is applied in place (0 = no TTL)."""
+    from pymongo import ASCENDING
+    from pymongo.errors import OperationFailure
+
+    ttl_seconds = days * 24 * 60 * 60
+    if ttl_seconds <= 0:
+        return
+    try:
+        await collection.create_index([("updated_at", ASCENDING)], name=TTL_INDEX, expireAfterSeconds=ttl_seconds)
+    except OperationFailure as e:
+        if e.code not in (85, 86):   # IndexOptionsConflict / IndexKeySpecsConflict
+            raise
+        # the TTL setting changed since the index was built: update it in place
+        await collection.database.command("collMod", collection.name,
+                                          index={"name": TTL_INDEX, "expireAfterSeconds": ttl_seconds})
+
+
+#------------------------Lifecycle---------------------
+
+async def init_mongo():
+    """Create the client, check the server is reachable and build indexes (lifespan startup)."""
+    await get_client().admin.command("ping")
+    await ensure_indexes()
+
+
+def close_mongo():
+    """Close pooled connections (lifespan shutdown)."""
+    global _client, _db
+    if _client is not None:
+        _client.close()
+        logger.info("Mongo client closed")
+    _client = None
+    _db = None
+
+logger.info("mango out")
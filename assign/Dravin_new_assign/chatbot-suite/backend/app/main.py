@@ -1,14 +1,49 @@
 from app.core.logger import logger
 logger.info("main enter")
 from app.api import chatbot
+from app.services.openrouter_client import init_client, close_client
+from app.db.mango import init_mongo, close_mongo
+from app.db.crud import backfill_message_count
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI 
 from fastapi.middleware.cors import CORSMiddleware
 
+
+# ───────────────────────
+# Startup / shutdown (clients are built here, not at import time)
+# ───────────────────────
+async def prepare_mongo():
+    try:
+        await init_mongo()
+        await backfill_message_count()
+    except Exception:
+        # Keep serving: chats fall back to fresh sessions until Mongo is back
+        logger.exception("MongoDB unavailable at startup, indexes not ensured")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 Chatbot API server starting up...")
+    await init_client()
+    # Ping + index builds can take seconds (server selection); don't hold up readiness
+    mongo_ready = asyncio.create_task(prepare_mongo())
+
+    yield
+
+    mongo_ready.cancel()
+
+    logger.info("🛑 Chatbot API server shutting down...")
+    await close_client()
+    close_mongo()
+
+
 app = FastAPI(
     title="Chatbot API",   
     version="1.0.0",
     description="Backend API for chatbot app",
+    lifespan=lifespan,
 )
 
 # ───────────────────────
@@ -39,17 +74,4 @@ async def root():
 app.include_router(chatbot.router, prefix="/api")
 # app.include_router(user.router, prefix="/api")
 
-
-
-# ───────────────────────
-# Startup / shutdown logs
-# ───────────────────────
-@app.on_event("startup")
-async def on_startup():
-    logger.info("🚀 Chatbot API server starting up...")
-  
-@app.on_event("shutdown")
-async def on_shutdown():
-    logger.info("🛑 Chatbot API server shutting down...")
-    
 logger.info("main out") 
\ No newline at end of file
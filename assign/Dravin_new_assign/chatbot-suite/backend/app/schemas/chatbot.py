@@ -8,4 +8,13 @@ class Createchat(BaseModel):
     messages:list[dict]
     session_id: Optional[str]
 
+
+class ChatWindow(BaseModel):
+    messages: list[dict]          # system prompt first, then stored + new messages
+    new_from: int                 # index of the first message not yet stored
+    first_index: int = 1          # storage index of messages[1]
+    summary: str = ""             # rolling summary of older turns
+    summary_upto: int = 0         # stored messages [0, summary_upto) are in the summary
+    version: int = 0              # message_count when loaded (0 = nothing stored yet)
+
 logger.info("schema/chatbot out")
\ No newline at end of file
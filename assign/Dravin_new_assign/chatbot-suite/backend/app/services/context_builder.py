@@ -0,0 +1,106 @@
+from app.core.logger import logger
+logger.info("service/context_builder enter")
+import app.core.config
+from app.schemas.chatbot import ChatWindow
+from app.db.crud import save_summary, record_usage
+from app.services.openrouter_client import assistant
+
+import asyncio
+
+
+#------------------------1. Token counting---------------------
+MESSAGE_OVERHEAD = 4   # role + separators per chat message
+_encoding = None
+_encoding_failed = False
+
+
+def get_encoding():
+    """o200k_base (gpt-4o family), loaded on first use; None if tiktoken is unavailable."""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:   # not installed, or the encoding file cannot be fetched
+            logger.warning("tiktoken encoding unavailable, estimating tokens from length")
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD
+
+
+#------------------------2. Context window---------------------
+
+def build_context(window: ChatWindow, budget: int | None = None):
+    """
+    Return (context, to_fold, fold_upto).
+
+    context  : system prompt, rolling summary (if any) and the newest turns that
+               fit in `budget` tokens; the newest message is always kept.
+    to_fold  : dropped messages not yet covered by the summary.
+    fold_upto: storage index the summary will cover once `to_fold` is folded in.
+    """
+    budget = budget or app.core.config.CONTEXT_TOKEN_BUDGET
+    system, history = window.messages[0], window.messages[1:]
+
+    head = [system]
+    if window.summary:
+        head.append({"role": "system", "content": f"Summary of the earlier conversation:\n{window.summary}"})
+    used = sum(message_tokens(m) for m in head)
+
+    kept = 0
+    for message in reversed(history):
+        cost = message_tokens(message)
+        if kept and used + cost > budget:
+            break
+        used += cost
+        kept += 1
+
+    dropped = len(history) - kept
+    fold_from = max(0, window.summary_upto - window.first_index)
+    to_fold = history[fold_from:dropped]
+    logger.debug("Context: %d/%d messages, ~%d tokens, %d to fold", kept, len(history), used, len(to_fold))
+    return head + history[dropped:], to_fold, window.first_index + dropped
+
+
+#------------------------3. Rolling summary---------------------
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the new messages into the current summary. Keep facts, names, decisions and open "
+    "questions; drop pleasantries. Reply with the updated summary only, under 200 words."
+)
+_pending_folds: set[asyncio.Task] = set()
+
+
+async def fold_into_summary(session_id: str, summary: str, to_fold: list[dict], fold_upto: int,
+                            ip: str | None = None):
+    transcript = "\n".join(f"{m['role']}: {m.get('content') or ''}" for m in to_fold)
+    usage = {}
+    new_summary = await assistant([
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"},
+    ], usage=usage)
+    await record_usage(session_id, usage, ip)   # summaries are billed to the session too
+    if new_summary:
+        await save_summary(session_id, new_summary, fold_upto)
+        logger.info("Summary for %s now covers %d messages", session_id, fold_upto)
+
+
+def schedule_fold(session_id: str, summary: str, to_fold: list[dict], fold_upto: int, ip: str | None = None):
+    """Summarize in the background so the reply is not delayed."""
+    task = asyncio.create_task(fold_into_summary(session_id, summary, to_fold, fold_upto, ip))
+    _pending_folds.add(task)
+    task.add_done_callback(_pending_folds.discard)
+    return task
+
+
+logger.info("service/context_builder out")
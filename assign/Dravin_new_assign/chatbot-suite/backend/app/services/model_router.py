@@ -0,0 +1,229 @@
+from app.core.logger import logger
+logger.info("service/model_router enter")
+import app.core.config
+from app.core.config import model_confi
+from app.services.context_builder import message_tokens, count_tokens
+from app.services.openrouter_client import complete, assistant_stream
+
+import asyncio
+import bisect
+import time
+from collections import deque
+
+
+#------------------------1. Latency histograms---------------------
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+class LatencyHistogram:
+    """Bucketed latency counts plus a rolling window for percentiles."""
+
+    def __init__(self, window: int = 200):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=window)
+        self.errors = 0
+        self.hedges = 0          # times this model was the slow primary
+        self.hedge_wins = 0      # times it answered first as the hedge
+
+    def observe(self, ms: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.recent.append(ms)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+    def as_dict(self) -> dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": sum(self.buckets),
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+histograms: dict[str, LatencyHistogram] = {}
+
+
+def histogram(model: str) -> LatencyHistogram:
+    if model not in histograms:
+        histograms[model] = LatencyHistogram()
+    return histograms[model]
+
+
+def router_stats() -> dict:
+    return {model: h.as_dict() for model, h in histograms.items()}
+
+
+#------------------------2. Routing plan---------------------
+
+def plan(messages: list[dict], routes: list[model_confi] | None = None) -> list[model_confi]:
+    """
+    Order the configured models for this request:
+      1. drop models whose context window cannot hold the prompt
+      2. keep models meeting the latency SLO (or without enough samples yet) in
+         configured order, then the ones missing it by observed p95
+    """
+    cfg = app.core.config
+    routes = routes or cfg.MODEL_ROUTES
+    prompt_tokens = sum(message_tokens(m) for m in messages)
+    fits = [m for m in routes if m.max_prompt_tokens >= prompt_tokens] or [max(routes, key=lambda m: m.max_prompt_tokens)]
+
+    healthy, slow = [], []
+    for m in fits:
+        h = histogram(m.model)
+        p95 = h.percentile(95)
+        if len(h.recent) < cfg.ROUTER_MIN_SAMPLES or p95 <= cfg.ROUTER_LATENCY_SLO_MS:
+            healthy.append(m)
+        else:
+            slow.append((p95, m))
+    return healthy + [m for _, m in sorted(slow, key=lambda item: item[0])]
+
+
+#------------------------3. Hedged completion with fallback---------------------
+
+class AllModelsFailed(RuntimeError):
+    pass
+
+
+def add_estimated_usage(usage: dict | None, messages: list[dict], model: str, completion: str = ""):
+    """
+    Count an attempt the provider bills but whose usage never reached us (a
+    cancelled hedge/primary, a stream abandoned before its final chunk): the
+    prompt as we tokenize it plus the completion text we know of.
+    """
+    if usage is None:
+        return
+    prompt_tokens = sum(message_tokens(m) for m in messages)
+    completion_tokens = count_tokens(completion) if completion else 0
+    usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + prompt_tokens
+    usage["completion_tokens"] = usage.get("completion_tokens", 0) + completion_tokens
+    usage["total_tokens"] = usage.get("total_tokens", 0) + prompt_tokens + completion_tokens
+    logger.debug("Estimated %d tokens for an unfinished call on %s", prompt_tokens + completion_tokens, model)
+
+
+async def _timed_complete(messages: list[dict], model: str, usage: dict | None) -> str:
+    started = time.perf_counter()
+    try:
+        reply = await complete(messages, model, usage)
+        if not reply:
+            raise ValueError("empty reply")
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        histogram(model).errors += 1
+        raise
+    histogram(model).observe((time.perf_counter() - started) * 1000)
+    return reply
+
+
+async def route_completion(messages: list[dict], hedge_after: float | None = None,
+                           usage: dict | None = None) -> tuple[str, str]:
+    """
+    Return (reply, model). The first model in `plan` is called; if it has not
+    answered after `hedge_after` seconds the next one is started as well and the
+    first answer wins. Errors fall through to the next model in the plan.
+    Token usage of every attempt that completed (hedges too) is added to `usage`;
+    attempts cancelled in flight are still billed, so they are estimated.
+    """
+    hedge_after = app.core.config.ROUTER_HEDGE_AFTER if hedge_after is None else hedge_after
+    queue = plan(messages)
+    pending: dict[asyncio.Task, str] = {}
+    hedge_task = None
+    reply = ""
+
+    def launch():
+        model = queue.pop(0).model
+        task = asyncio.create_task(_timed_complete(messages, model, usage))
+        pending[task] = model
+        return task
+
+    launch()
+    try:
+        while pending:
+            can_hedge = hedge_after > 0 and hedge_task is None and queue and len(pending) == 1
+            done, _ = await asyncio.wait(pending, timeout=hedge_after if can_hedge else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                slow_model = next(iter(pending.values()))
+                histogram(slow_model).hedges += 1
+                hedge_task = launch()
+                logger.info("Hedging %s after %.1fs with %s", slow_model, hedge_after, pending[hedge_task])
+                continue
+
+            for task in done:
+                model = pending.pop(task)
+                if task.exception() is None:
+                    if task is hedge_task:
+                        histogram(model).hedge_wins += 1
+                    reply = task.result()
+                    return reply, model
+                logger.warning("Model %s failed: %r", model, task.exception())
+
+            if not pending and queue:
+                logger.info("Falling back to %s", queue[0].model)
+                launch()
+    finally:
+        for task, model in pending.items():
+            if not task.done():   # a task that finished has added its real usage already
+                task.cancel()
+                # the loser generated roughly as much as the winner
+                add_estimated_usage(usage, messages, model, reply)
+
+    raise AllModelsFailed("every routed model failed")
+
+
+#------------------------4. Streaming with fallback---------------------
+
+async def route_stream(messages: list[dict], usage: dict | None = None, served: dict | None = None):
+    """
+    Stream from the first model in `plan` that produces a token; a model that
+    fails before its first token falls back to the next. Once tokens have been
+    sent the stream cannot switch models, so later errors propagate.
+    The streaming model is put in `served["model"]`. Latency is recorded as
+    time to first token. Close this generator (aclosing) before reading `usage`:
+    a stream cut short never gets its usage chunk and is estimated on close.
+    """
+    for route in plan(messages):
+        started = time.perf_counter()
+        billed = usage.get("total_tokens", 0) if usage is not None else 0
+        failed, streamed = False, []
+        stream = assistant_stream(messages, route.model, usage)
+        try:
+            try:
+                first = await anext(stream)
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                failed = True
+                histogram(route.model).errors += 1
+                logger.warning("Model %s failed before streaming: %r", route.model, e)
+                continue
+
+            if first is None:
+                histogram(route.model).errors += 1
+                continue
+            histogram(route.model).observe((time.perf_counter() - started) * 1000)
+            if served is not None:
+                served["model"] = route.model
+            streamed.append(first)
+            yield first
+            async for delta in stream:
+                streamed.append(delta)
+                yield delta
+            return
+        finally:
+            if not failed and usage is not None and usage.get("total_tokens", 0) == billed:
+                add_estimated_usage(usage, messages, route.model, "".join(streamed))
+            await stream.aclose()
+
+    raise AllModelsFailed("every routed model failed")
+
+
+logger.info("service/model_router out")
@@ -2,27 +2,119 @@ from app.core.logger import logger
 logger.info("service/openrouter_client enter")
 import app.core.config 
 
-from openai import OpenAI
+import asyncio
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-#------------------------Model---------------------
 
-async def assistant(messages:list):
-    # print(app.core.config.get_api_key())
-    client=OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=app.core.config.get_api_key(), 
+#------------------------Shared client---------------------
+# One AsyncOpenAI client (and its httpx keep-alive pool) for the whole app,
+# created in the main.lifespan startup and closed on shutdown. openai is
+# imported there too: it is the largest import of the app (~0.4s cold).
+_client: "AsyncOpenAI | None" = None
+_limiter: asyncio.Semaphore | None = None
+
+
+async def init_client():
+    global _client, _limiter
+    if _client is not None:
+        return _client
+
+    import httpx
+    from openai import AsyncOpenAI
+
+    cfg = app.core.config
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=cfg.OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=cfg.OPENROUTER_MAX_KEEPALIVE,
+            keepalive_expiry=cfg.OPENROUTER_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(cfg.OPENROUTER_READ_TIMEOUT, connect=cfg.OPENROUTER_CONNECT_TIMEOUT),
     )
-     
-    try:
-        response=client.chat.completions.create(
-            model=app.core.config.default_model.model,
+    _client = AsyncOpenAI(
+        base_url=cfg.OPENROUTER_BASE_URL,
+        api_key=cfg.get_api_key(),
+        http_client=http_client,
+        max_retries=cfg.OPENROUTER_MAX_RETRIES,
+    )
+    _limiter = asyncio.Semaphore(cfg.OPENROUTER_CONCURRENCY)
+    logger.info("OpenRouter client ready (max_connections=%s, concurrency=%s)",
+                cfg.OPENROUTER_MAX_CONNECTIONS, cfg.OPENROUTER_CONCURRENCY)
+    return _client
+
+
+async def close_client():
+    global _client, _limiter
+    if _client is not None:
+        await _client.close()
+        logger.info("OpenRouter client closed")
+    _client = None
+    _limiter = None
+
+
+async def get_client() -> "AsyncOpenAI":
+    # Lazily create the client when used outside the FastAPI lifecycle (scripts, tests)
+    return _client if _client is not None else await init_client()
+
+
+#------------------------Model---------------------
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def add_usage(sink: dict | None, usage):
+    """Add an OpenAI `usage` object's token counts into `sink` (if one was passed)."""
+    if sink is None or usage is None:
+        return
+    for name in USAGE_FIELDS:
+        sink[name] = sink.get(name, 0) + (getattr(usage, name, 0) or 0)
+
+
+async def complete(messages:list, model:str, usage:dict | None = None):
+    """One chat completion on `model`; errors propagate (see services/model_router.py)."""
+    client = await get_client()
+    async with _limiter:
+        response = await client.chat.completions.create(
+            model=model,
             messages=messages,
         )
-        
-        return response.choices[0].message.content 
+    add_usage(usage, response.usage)
+    return response.choices[0].message.content
+
+
+async def assistant(messages:list, usage:dict | None = None):
+    try:
+        return await complete(messages, app.core.config.default_model.model, usage)
     except Exception as e:
         logger.exception("OpenRouter call failed")
         return None 
     
-logger.info("service/openrouter_client out") 
\ No newline at end of file
+
+async def assistant_stream(messages:list, model:str | None = None, usage:dict | None = None):
+    """Yield content deltas as OpenRouter produces them; token usage arrives in the last chunk."""
+    client = await get_client()
+    async with _limiter:
+        stream = await client.chat.completions.create(
+            model=model or app.core.config.default_model.model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            add_usage(usage, getattr(chunk, "usage", None))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def embed(text: str, model: str) -> list[float]:
+    """Embedding vector for `text` (used by the semantic response cache)."""
+    client = await get_client()
+    async with _limiter:
+        response = await client.embeddings.create(model=model, input=text)
+    return response.data[0].embedding
+
+
+logger.info("service/openrouter_client out")
@@ -0,0 +1,109 @@
+from app.core.logger import logger
+logger.info("service/rate_limit enter")
+import app.core.config
+from app.db.crud import get_usage, get_ip_usage
+
+import math
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+
+
+#------------------------1. Token buckets---------------------
+
+class TokenBucket:
+    """`rate` tokens per second refill up to `burst`; each request takes one."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """0 if the request may proceed, else seconds until a token is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """One bucket per key; the least recently seen keys are dropped past `max_keys`."""
+
+    def __init__(self, per_minute: float, burst: float, max_keys: int = 10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def check(self, key: str) -> float:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket.take()
+
+
+cfg = app.core.config
+session_limiter = RateLimiter(cfg.RATE_LIMIT_SESSION_PER_MINUTE, cfg.RATE_LIMIT_SESSION_BURST)
+ip_limiter = RateLimiter(cfg.RATE_LIMIT_IP_PER_MINUTE, cfg.RATE_LIMIT_IP_BURST)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def too_many_requests(wait: float, detail: str) -> HTTPException:
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(math.ceil(wait))})
+
+
+async def rate_limit(request: Request):
+    """
+    FastAPI dependency for the chat routes: throttle per client IP and per
+    session cookie (a new visitor without a cookie is covered by the IP bucket).
+    """
+    if not cfg.RATE_LIMIT_ENABLED:
+        return
+    ip = client_ip(request)
+    wait = ip_limiter.check(ip)
+    if wait:
+        logger.warning("Rate limited ip=%s", ip)
+        raise too_many_requests(wait, "Too many requests from this address")
+
+    session_id = request.cookies.get("session_id")
+    if session_id:
+        wait = session_limiter.check(session_id)
+        if wait:
+            logger.warning("Rate limited session_id=%s", session_id)
+            raise too_many_requests(wait, "Too many messages, please slow down")
+
+
+#------------------------2. Token quota---------------------
+
+async def enforce_quota(session_id: str, ip: str | None = None):
+    """
+    Refuse a model call once the session, or the client IP across all its
+    sessions (a client dropping the cookie gets a new session), used its daily
+    token quota.
+    """
+    if cfg.SESSION_DAILY_TOKEN_QUOTA:
+        usage = await get_usage(session_id)
+        if usage.get("total_tokens", 0) >= cfg.SESSION_DAILY_TOKEN_QUOTA:
+            logger.warning("Token quota exhausted for session_id=%s (%s tokens)", session_id, usage["total_tokens"])
+            raise HTTPException(status_code=429, detail="Daily message quota reached, please come back tomorrow")
+    if cfg.IP_DAILY_TOKEN_QUOTA and ip:
+        usage = await get_ip_usage(ip)
+        if usage.get("total_tokens", 0) >= cfg.IP_DAILY_TOKEN_QUOTA:
+            logger.warning("Token quota exhausted for ip=%s (%s tokens)", ip, usage["total_tokens"])
+            raise HTTPException(status_code=429, detail="Daily message quota reached, please come back tomorrow")
+
+
+logger.info("service/rate_limit out")
@@ -0,0 +1,260 @@
+from app.core.logger import logger
+logger.info("service/response_cache enter")
+import app.core.config
+from app.services.openrouter_client import embed
+from app.services.model_router import plan
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+
+#------------------------1. Cache key---------------------
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_prompt(text: str) -> str:
+    """'  What are your  HOURS?? ' -> 'what are your hours'"""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def cacheable_prompt(messages: list[dict]) -> str | None:
+    """
+    The user question when the reply depends on nothing but it (system prompt +
+    one user message, no history or summary); otherwise None.
+    """
+    if len(messages) != 2 or messages[0]["role"] != "system" or messages[1]["role"] != "user":
+        return None
+    return normalize_prompt(messages[1].get("content") or "") or None
+
+
+def scope_of(model: str, system_prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{system_prompt}".encode()).hexdigest()[:16]
+
+
+#------------------------2. Cache---------------------
+
+@dataclass
+class CacheEntry:
+    reply: str
+    scope: str
+    expires_at: float
+    vector: "numpy.ndarray | None" = None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    lookup_ms: list[float] = field(default_factory=list)
+
+    def as_dict(self, size: int) -> dict:
+        lookups = self.hits + self.semantic_hits + self.misses
+        recent = sorted(self.lookup_ms[-1000:])
+        return {
+            "size": size,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "p50_lookup_ms": round(recent[len(recent) // 2], 3) if recent else 0.0,
+        }
+
+
+def _unit(vector: list[float]):
+    import numpy   # only needed by the semantic tier; deferred like the other heavy imports
+    array = numpy.asarray(vector, dtype=numpy.float32)
+    return array / (numpy.linalg.norm(array) or 1.0)
+
+
+class VectorIndex:
+    """
+    Unit vectors of one scope as rows of a preallocated float32 matrix (capacity
+    doubles when full), so a lookup is one matrix-vector product instead of a
+    Python loop over every cached prompt.
+    """
+
+    def __init__(self, dim: int, capacity: int = 64):
+        import numpy
+        self.matrix = numpy.empty((capacity, dim), dtype=numpy.float32)
+        self.keys: list[str] = []
+        self.rows: dict[str, int] = {}
+
+    def add(self, key: str, vector):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                import numpy
+                grown = numpy.empty((2 * len(self.matrix), self.matrix.shape[1]), dtype=numpy.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector
+
+    def remove(self, key: str):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self.keys) - 1
+        if row != last:   # move the last row into the hole
+            moved = self.keys[last]
+            self.matrix[row] = self.matrix[last]
+            self.keys[row] = moved
+            self.rows[moved] = row
+        self.keys.pop()
+
+    def nearest(self, vector) -> tuple[str | None, float]:
+        if not self.keys:
+            return None, 0.0
+        scores = self.matrix[:len(self.keys)] @ vector
+        best = int(scores.argmax())
+        return self.keys[best], float(scores[best])
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class ResponseCache:
+    """
+    Exact tier : LRU dict keyed by scope (model + system prompt) + normalized prompt.
+    Semantic tier (optional): cosine similarity over the unit embedding vectors of
+    the cached prompts in the same scope (one VectorIndex per scope); enabled
+    when an embedding model is set.
+    Entries expire after `ttl` seconds; the least recently used is evicted at
+    `max_entries`.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, embed_model: str | None = None,
+                 similarity_threshold: float = 0.92):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embed_model = embed_model
+        self.similarity_threshold = similarity_threshold
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.indexes: dict[str, VectorIndex] = {}
+        self.stats = CacheStats()
+
+    def _key(self, scope: str, prompt: str) -> str:
+        return f"{scope}:{prompt}"
+
+    def _live(self, key: str, now: float) -> CacheEntry | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._drop(key)
+            self.stats.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    async def _embed(self, prompt: str) -> list[float] | None:
+        if not self.embed_model:
+            return None
+        try:
+            return _unit(await embed(prompt, self.embed_model))
+        except Exception:
+            logger.warning("Embedding failed, semantic cache tier skipped for this prompt", exc_info=True)
+            return None
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key)
+        index = self.indexes.get(entry.scope)
+        if entry.vector is not None and index is not None:
+            index.remove(key)
+            if not index:
+                del self.indexes[entry.scope]
+
+    async def get(self, scope: str, prompt: str):
+        """Return (reply or None, prompt vector) — the vector is reused by `put` on a miss."""
+        started = time.perf_counter()
+        now = time.monotonic()
+        vector = None
+        try:
+            entry = self._live(self._key(scope, prompt), now)
+            if entry is not None:
+                self.stats.hits += 1
+                return entry.reply, None
+
+            vector = await self._embed(prompt)
+            index = self.indexes.get(scope)
+            if vector is not None and index is not None:
+                key, score = index.nearest(vector)
+                entry = self._live(key, now) if score >= self.similarity_threshold else None
+                if entry is not None:
+                    self.stats.semantic_hits += 1
+                    logger.debug("Semantic cache hit (%.3f) for %r", score, prompt)
+                    return entry.reply, vector
+
+            self.stats.misses += 1
+            return None, vector
+        finally:
+            self.stats.lookup_ms.append((time.perf_counter() - started) * 1000)
+            del self.stats.lookup_ms[:-1000]
+
+    def put(self, scope: str, prompt: str, reply: str, vector=None):
+        key = self._key(scope, prompt)
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = CacheEntry(reply, scope, time.monotonic() + self.ttl, vector)
+        if vector is not None:
+            if scope not in self.indexes:
+                self.indexes[scope] = VectorIndex(len(vector))
+            self.indexes[scope].add(key, vector)
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+            self.stats.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.indexes.clear()
+        self.stats = CacheStats()
+
+    def snapshot(self) -> dict:
+        return self.stats.as_dict(len(self.entries))
+
+
+#------------------------3. App-wide cache---------------------
+cfg = app.core.config
+response_cache = ResponseCache(
+    max_entries=cfg.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=cfg.RESPONSE_CACHE_TTL,
+    embed_model=cfg.RESPONSE_CACHE_EMBED_MODEL,
+    similarity_threshold=cfg.RESPONSE_CACHE_SIMILARITY,
+)
+
+
+async def cached_reply(context: list[dict]):
+    """
+    Look `context` up in the cache. Returns (reply, store) where `reply` is the
+    cached answer or None and `store(reply, model)` caches a fresh answer (a
+    no-op for turns that are not cacheable).
+
+    Lookups use the scope of the model the router would call first; a reply is
+    stored under the model that actually produced it (a hedge or fallback), so
+    it is only served while that model is the one routing prefers.
+    """
+    prompt = cacheable_prompt(context) if cfg.RESPONSE_CACHE_ENABLED else None
+    if prompt is None:
+        return None, lambda reply, model: None
+
+    system = context[0]["content"]
+    reply, vector = await response_cache.get(scope_of(plan(context)[0].model, system), prompt)
+
+    def store(fresh: str | None, model: str):
+        if fresh and reply is None:
+            response_cache.put(scope_of(model, system), prompt, fresh, vector)
+
+    return reply, store
+
+
+logger.info("service/response_cache out")
@@ -0,0 +1,64 @@
+from app.core.logger import logger
+logger.info("service/session_guard enter")
+import app.core.config
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+
+
+#------------------------1. Per-session turn lock---------------------
+# session_id -> [lock, holders + waiters]; entries are dropped when nobody uses them
+_locks: dict[str, list] = {}
+
+
+@asynccontextmanager
+async def session_turn(session_id: str):
+    """
+    Serialize turns of one session so each turn reads the history the previous
+    one wrote. At most SESSION_MAX_QUEUED turns may wait; more get 429.
+    """
+    entry = _locks.setdefault(session_id, [asyncio.Lock(), 0])
+    if entry[1] > app.core.config.SESSION_MAX_QUEUED:
+        raise HTTPException(status_code=429, detail="Too many messages in flight for this chat")
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _locks.pop(session_id, None)
+
+
+#------------------------2. Coalescing duplicates---------------------
+# (session_id, query) -> future of the in-flight turn's result
+_inflight: dict[tuple[str, str], asyncio.Future] = {}
+
+
+async def coalesce(session_id: str, query: str, run):
+    """
+    Run `run()` once per (session, query) in flight: a repeated POST of the same
+    message (double click, client retry) awaits the first one's result instead
+    of calling the model again and storing the turn twice.
+    """
+    key = (session_id, " ".join(query.split()))
+    if key in _inflight:
+        logger.info("Coalescing duplicate request for session %s", session_id)
+        return await asyncio.shield(_inflight[key])
+
+    future = asyncio.get_running_loop().create_future()
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())   # no "never retrieved" warning
+    _inflight[key] = future
+    try:
+        result = await run()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e if isinstance(e, Exception) else asyncio.CancelledError())
+        raise
+    finally:
+        del _inflight[key]
+
+
+logger.info("service/session_guard out")
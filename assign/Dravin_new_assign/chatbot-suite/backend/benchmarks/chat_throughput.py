@@ -0,0 +1,69 @@
+"""
+Concurrent throughput benchmark for POST /api/chatbot/chat.
+
+Each virtual user keeps its own cookie jar (so its own session_id) and sends
+`--turns` messages back to back. Run it against a running backend:
+
+    python benchmarks/chat_throughput.py --url http://localhost:7000 --users 50 --turns 4
+
+Compare runs before/after a change (or with OPENROUTER_CONCURRENCY tuned) to
+see how many concurrent chats the event loop sustains.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def virtual_user(base_url, turns, timeout, latencies, errors):
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        for turn in range(turns):
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/chatbot/chat", json={"query": f"Benchmark question {turn}"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors.append(time.perf_counter() - start)
+
+
+async def run(args):
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        virtual_user(args.url, args.turns, args.timeout, latencies, errors)
+        for _ in range(args.users)
+    ))
+    elapsed = time.perf_counter() - started
+
+    values = sorted(latencies)
+    total = len(latencies) + len(errors)
+    print(f"users={args.users} turns={args.turns} requests={total} errors={len(errors)} elapsed={elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    if values:
+        print(f"latency ms: mean={statistics.mean(values) * 1000:.0f} "
+              f"p50={percentile(values, 50) * 1000:.0f} "
+              f"p95={percentile(values, 95) * 1000:.0f} "
+              f"p99={percentile(values, 99) * 1000:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:7000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Replay recorded conversations against POST /api/chatbot/chat, offline.
+
+With --spawn a local model stub (benchmarks/stub_openrouter.py) and a backend
+pointing at it are started on free ports, so no credits are spent; only
+MongoDB has to be reachable (MONGO_URI). Without --spawn, --url is used as is.
+
+    python benchmarks/replay.py --spawn --traces benchmarks/traces/sample.jsonl --users 50 --repeat 20
+    python benchmarks/replay.py --spawn --latency-ms 800 --error-rate 0.05 --users 100
+
+A trace file has one conversation per line: {"turns": ["first question", "follow-up", ...]}.
+Each replay of a conversation uses its own cookie jar (a new session).
+
+Reports throughput, p50/p95/p99 turn latency, errors by status and the Mongo
+write volume of the run (update ops, bytes received by mongod, data size growth).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TRACES = os.path.join(BACKEND_DIR, "benchmarks", "traces", "sample.jsonl")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def load_traces(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["turns"] for line in f if line.strip()]
+
+
+#------------------------Mongo write volume---------------------
+
+def mongo_snapshot(uri):
+    """serverStatus / dbStats counters, or None if Mongo cannot be read."""
+    try:
+        from pymongo import MongoClient
+        with MongoClient(uri, serverSelectionTimeoutMS=2000) as client:
+            status = client.admin.command("serverStatus")
+            stats = client["chatbot_db"].command("dbStats")
+            return {
+                "updates": status["opcounters"]["update"],
+                "inserts": status["opcounters"]["insert"],
+                "bytes_in": status["network"]["bytesIn"],
+                "data_size": stats.get("dataSize", 0),
+            }
+    except Exception as e:
+        print(f"(Mongo stats unavailable: {e})", file=sys.stderr)
+        return None
+
+
+#------------------------Local stub + backend---------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url}: process exited during startup")
+            time.sleep(0.05)
+    raise RuntimeError(f"{url}: not ready after {timeout}s")
+
+
+def spawn(args):
+    """Start the stub and a backend using it; returns (backend_url, processes)."""
+    stub_port, backend_port = free_port(), free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "stub_openrouter.py"),
+         "--port", str(stub_port), "--latency-ms", str(args.latency_ms),
+         "--tokens-per-second", str(args.tokens_per_second), "--error-rate", str(args.error_rate)],
+        cwd=BACKEND_DIR,
+    )
+    wait_ready(f"http://127.0.0.1:{stub_port}/stats", stub)
+
+    env = {
+        **os.environ,
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "OPENROUTER_API_KEY": "stub",
+        # the benchmark measures the serving path, not our own throttles
+        "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "0"),
+        "SESSION_DAILY_TOKEN_QUOTA": os.getenv("SESSION_DAILY_TOKEN_QUOTA", "0"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "INFO"),
+    }
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(backend_port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{backend_port}"
+    wait_ready(url, backend)
+    return url, [backend, stub]
+
+
+#------------------------Replay---------------------
+
+async def replay_conversation(base_url, turns, timeout, latencies, statuses):
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        for query in turns:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/chatbot/chat", json={"query": query})
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+
+
+async def run(args, base_url):
+    traces = load_traces(args.traces)
+    conversations = [turns for _ in range(args.repeat) for turns in traces]
+    latencies, statuses = [], Counter()
+    limiter = asyncio.Semaphore(args.users)
+
+    async def user(turns):
+        async with limiter:
+            await replay_conversation(base_url, turns, args.timeout, latencies, statuses)
+
+    before = mongo_snapshot(args.mongo_uri) if args.mongo_uri else None
+    started = time.perf_counter()
+    await asyncio.gather(*(user(turns) for turns in conversations))
+    elapsed = time.perf_counter() - started
+    after = mongo_snapshot(args.mongo_uri) if before else None
+
+    values = sorted(latencies)
+    total = sum(statuses.values())
+    print(f"conversations={len(conversations)} turns={total} users={args.users} elapsed={elapsed:.2f}s")
+    print(f"throughput: {len(values) / elapsed:.1f} turns/s")
+    if values:
+        print(f"latency ms: mean={statistics.mean(values) * 1000:.0f} "
+              f"p50={percentile(values, 50) * 1000:.0f} "
+              f"p95={percentile(values, 95) * 1000:.0f} "
+              f"p99={percentile(values, 99) * 1000:.0f}")
+    print("responses: " + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items(), key=str)))
+    if before and after:
+        ok = max(1, statuses[200])
+        updates = after["updates"] - before["updates"]
+        bytes_in = after["bytes_in"] - before["bytes_in"]
+        print(f"mongo: updates={updates} inserts={after['inserts'] - before['inserts']} "
+              f"bytes_in={bytes_in / 1024:.0f}KiB ({bytes_in / ok:.0f} B/turn) "
+              f"data_size_growth={(after['data_size'] - before['data_size']) / 1024:.0f}KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traces", default=DEFAULT_TRACES)
+    parser.add_argument("--users", type=int, default=20, help="conversations replayed concurrently")
+    parser.add_argument("--repeat", type=int, default=5, help="replays of every trace")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--url", default="http://localhost:7000", help="backend to drive (ignored with --spawn)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="for write-volume stats")
+    parser.add_argument("--spawn", action="store_true", help="start the model stub and a backend locally")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="stub time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="stub generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub share of failed calls")
+    args = parser.parse_args()
+
+    processes = []
+    base_url = args.url
+    if args.spawn:
+        base_url, processes = spawn(args)
+        print(f"backend {base_url} -> stub (latency {args.latency_ms:.0f}ms, "
+              f"{args.tokens_per_second:.0f} tok/s, errors {args.error_rate:.0%})")
+    try:
+        asyncio.run(run(args, base_url))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold-start benchmark for the backend: how long a fresh process needs to import
+`app.main`, and (with --serve) until uvicorn answers `GET /`.
+
+    python benchmarks/startup_time.py --runs 10
+    python benchmarks/startup_time.py --runs 5 --serve --top 15
+
+Every run is a new interpreter, so nothing is shared between measurements.
+Run it from backend/ with the same .env the container uses.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_serve(timeout):
+    """Seconds from process spawn until `GET /` returns 200 (includes lifespan startup)."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                if process.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                time.sleep(0.02)
+        raise RuntimeError(f"no response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def top_imports(count):
+    """Slowest modules (cumulative µs) from `python -X importtime`."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR,
+                            capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def summarize(label, values):
+    values = sorted(values)
+    print(f"{label}: runs={len(values)} min={values[0] * 1000:.0f}ms "
+          f"median={statistics.median(values) * 1000:.0f}ms max={values[-1] * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn until the first 200")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--top", type=int, default=0, help="list the N slowest imports")
+    args = parser.parse_args()
+
+    summarize("import app.main", [measure_import() for _ in range(args.runs)])
+    if args.serve:
+        summarize("spawn -> first 200", [measure_serve(args.timeout) for _ in range(args.runs)])
+    if args.top:
+        print("\nslowest imports (cumulative):")
+        for cumulative, name in top_imports(args.top):
+            print(f"{cumulative / 1000:>9.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Local OpenAI-compatible stub for benchmarking without spending credits.
+
+Serves POST /v1/chat/completions (plain and `stream=true`, with `usage`) and
+POST /v1/embeddings. Point the backend at it with
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:8900/v1
+
+    python benchmarks/stub_openrouter.py --port 8900 --latency-ms 300 --tokens-per-second 80 --error-rate 0.01
+
+--latency-ms is the time to first token (+/- --jitter), --tokens-per-second the
+generation speed after it, --error-rate the share of requests answered with
+--error-status (500 by default; use 429 to exercise rate-limit handling).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("the quick answer depends on context but in short you should check the details "
+         "before deciding what works best for your case").split()
+
+
+def create_app(args) -> FastAPI:
+    stub = FastAPI(title="OpenRouter stub")
+    stats = {"requests": 0, "errors": 0}
+
+    def reply_words(messages) -> list[str]:
+        # Deterministic per prompt, so repeated traces produce identical replies
+        seed = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).digest()
+        rng = random.Random(seed)
+        return [rng.choice(WORDS) for _ in range(args.reply_tokens)]
+
+    def prompt_tokens(messages) -> int:
+        return sum(len((m.get("content") or "")) // 4 + 4 for m in messages)
+
+    async def first_token_delay():
+        jitter = random.uniform(-args.jitter_ms, args.jitter_ms)
+        await asyncio.sleep(max(0.0, args.latency_ms + jitter) / 1000)
+
+    def failure():
+        stats["errors"] += 1
+        return JSONResponse(status_code=args.error_status,
+                            content={"error": {"message": "stub injected error", "code": args.error_status}})
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if random.random() < args.error_rate:
+            await first_token_delay()
+            return failure()
+
+        words = reply_words(body["messages"])
+        usage = {
+            "prompt_tokens": prompt_tokens(body["messages"]),
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens(body["messages"]) + len(words),
+        }
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body.get("model", "stub")}
+
+        if not body.get("stream"):
+            await first_token_delay()
+            await asyncio.sleep(len(words) / args.tokens_per_second)
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": usage,
+            }
+
+        async def events():
+            await first_token_delay()
+            for i, word in enumerate(words):
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"},
+                                      "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / args.tokens_per_second)
+            done = {**base, "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @stub.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = []
+        for i, text in enumerate(texts):
+            rng = random.Random(hashlib.sha256(text.lower().encode()).digest())
+            data.append({"object": "embedding", "index": i, "embedding": [rng.uniform(-1, 1) for _ in range(64)]})
+        return {"object": "list", "data": data, "model": body.get("model", "stub"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    @stub.get("/stats")
+    async def get_stats():
+        return stats
+
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Per-turn Mongo write size: full-array `$set` (old update_chat) vs `$push`
+(crud.append_messages). Uses the real update builder, no database needed.
+
+    python -m benchmarks.write_volume --turns 50
+"""
+import argparse
+from datetime import datetime, timezone
+
+import bson
+
+from app.db.crud import build_append_ops
+from app.schemas.chatbot import Createchat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--message-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    history = [{"role": "system", "content": "You are a good assistant"}]
+    print(f"{'turn':>5}{'$set bytes':>14}{'$push bytes':>14}")
+    set_total = push_total = 0
+    for turn in range(1, args.turns + 1):
+        new = [
+            {"role": "user", "content": "q" * args.message_chars},
+            {"role": "assistant", "content": "a" * args.message_chars},
+        ]
+        if turn == 1:
+            new = history + new
+            history = []
+        history.extend(new)
+
+        set_ops = {"$set": {"messages": history, "updated_at": now}, "$setOnInsert": {"created_at": now}}
+        push_ops = build_append_ops(Createchat(session_id="bench", messages=new), now)
+        set_bytes, push_bytes = len(bson.encode(set_ops)), len(bson.encode(push_ops))
+        set_total += set_bytes
+        push_total += push_bytes
+        if turn in (1, 2, 5) or turn % 10 == 0:
+            print(f"{turn:>5}{set_bytes:>14}{push_bytes:>14}")
+
+    print(f"total{set_total:>14}{push_total:>14}")
+
+
+if __name__ == "__main__":
+    main()
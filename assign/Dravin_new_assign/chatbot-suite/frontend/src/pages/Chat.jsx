@@ -11,57 +11,122 @@ function Chat() {
   const [messages, setMessages] = useState([]);
   // State for the input text box
   const [input, setInput] = useState('');
+  // Cursor for older history (null once the start of the chat is loaded)
+  const [historyCursor, setHistoryCursor] = useState(null);
+  // True while a reply is streaming in; the form is disabled meanwhile
+  const [streaming, setStreaming] = useState(false);
+  // Source of stable message ids, so updates find their bubble even after history is prepended
+  const nextId = useRef(0);
   // Ref to automatically scroll to the latest message
   const messagesEndRef = useRef(null);
+  // Set while prepending older messages so the view doesn't jump to the bottom
+  const skipScroll = useRef(false);
 
   // Auto-scrolls to the bottom when messages update
   useEffect(() => {
+    if (skipScroll.current) {
+      skipScroll.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
+  // Loads one page of stored history (newest page first) and prepends it
+  const loadHistory = async (before) => {
+    try {
+      const params = new URLSearchParams({ limit: 30 });
+      if (before) params.set('before', before);
+      const res = await fetch(`http://localhost:7000/api/chatbot/history?${params}`, {
+        credentials: 'include'
+      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const page = await res.json();
+
+      const older = page.messages.map((m) => ({
+        id: nextId.current++,
+        from: m.role === 'user' ? 'user' : 'bot',
+        text: m.content
+      }));
+      skipScroll.current = Boolean(before);
+      setMessages((prev) => [...older, ...prev]);
+      setHistoryCursor(page.next_cursor);
+    } catch (err) {
+      console.error('History error:', err);
+    }
+  };
+
+  // Show the latest part of an existing conversation when the page opens
+  useEffect(() => {
+    loadHistory(null);
+  }, []);
+
   // Called when user submits a message
   const handleSend = async (e) => {
     e.preventDefault(); // Prevents page reload
-    if (!input.trim()) return; // Do nothing for empty input
+    if (!input.trim() || streaming) return; // Do nothing for empty input or mid-reply
 
-    // Add user's message to the message list immediately
-    const userMessage = { from: 'user', text: input };
-    setMessages((prev) => [...prev, userMessage]);
+    const query = input;
+    setInput(''); // Clear the input box right away
+    setStreaming(true);
+
+    // Add user's message plus an empty bot message that fills in as tokens arrive
+    const userMessage = { id: nextId.current++, from: 'user', text: query };
+    const botId = nextId.current++;
+    setMessages((prev) => [...prev, userMessage, { id: botId, from: 'bot', text: '' }]);
+
+    // Replace / extend the text of this turn's bot message
+    const updateBot = (fn) =>
+      setMessages((prev) =>
+        prev.map((msg) => (msg.id === botId ? { ...msg, text: fn(msg.text) } : msg))
+      );
 
     try {
-      // Send the message to your FastAPI backend
-      const res = await fetch('http://localhost:7000/api/chatbot/chat', {
+      // Stream the reply from the FastAPI backend as Server-Sent Events
+      const res = await fetch('http://localhost:7000/api/chatbot/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
         },
         credentials: 'include', // Important to maintain session using cookies
-        body: JSON.stringify({ query: input }) // Send the user input as `query`
+        body: JSON.stringify({ query }) // Send the user input as `query`
       });
- 
-      // Parse JSON response from backend
-      const data = await res.json();
-    
-        
-      // Add bot's response to messages
-      const botMessage = {
-        from: 'bot',
-        text: data.reply || 'No reply' // fallback if response is empty
-      };
-
-      setMessages((prev) => [...prev, botMessage]);
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE events are separated by a blank line; keep any partial event in the buffer
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1] || 'message';
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+
+          if (event === 'message' && data.delta) {
+            updateBot((text) => text + data.delta);
+          } else if (event === 'error') {
+            updateBot((text) => text || 'Error getting response.');
+          }
+        }
+      }
+
+      // fallback if the stream ended without any text
+      updateBot((text) => text || 'No reply');
 
     } catch (err) {
       console.error('Chat error:', err);
       // Show error message in chat box if backend fails
-      setMessages((prev) => [
-        ...prev,
-        { from: 'bot', text: 'Error getting response.' }
-      ]);
+      updateBot(() => 'Error getting response.');
     }
 
-    // Clear the input box after sending
-    setInput('');
+    setStreaming(false);
   };
 
   return (
@@ -74,10 +139,21 @@ function Chat() {
         className="mb-3 shadow"
         style={{ height: '60vh', overflowY: 'auto', padding: '1rem' }}
       >
+        {/* Older messages are fetched on demand */}
+        {historyCursor && (
+          <Button
+            variant="link"
+            size="sm"
+            className="mb-2"
+            onClick={() => loadHistory(historyCursor)}
+          >
+            Load earlier messages
+          </Button>
+        )}
         {/* Loop through all messages */}
-        {messages.map((msg, idx) => (
+        {messages.map((msg) => (
           <div
-            key={idx}
+            key={msg.id}
             className={`d-flex mb-3 ${
               msg.from === 'user' ? 'justify-content-end' : 'justify-content-start'
             }`} // Align left/right based on sender
@@ -104,9 +180,10 @@ function Chat() {
           placeholder="Type your message..."
           value={input}
           onChange={(e) => setInput(e.target.value)}
+          disabled={streaming}
         />
         {/* Submit button */}
-        <Button type="submit" variant="primary">
+        <Button type="submit" variant="primary" disabled={streaming}>
           Send
         </Button>
       </Form>
@@ -3,7 +3,14 @@ from flask import Flask
 def create_app():
     app = Flask(__name__)
     app.secret_key = 'haribol'  # 🔐 Required for session
+
+    from .i18n import init_i18n
+    init_i18n(app)
+
     from .routes import main
     app.register_blueprint(main)
 
+    from .drafts import start_draft_sweeper
+    start_draft_sweeper()
+
     return app
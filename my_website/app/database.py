@@ -8,8 +8,13 @@ import hashlib
 import traceback
 import qrcode
 
+from app.dedup import normalize_phone, normalize_name, phonetic_key, duplicate_reason, BLOCKING_REASONS
+
 DB_NAME = 'database.db'
 RECORDS_PER_PAGE = 50
+SQLITE_MAX_PARAMS = 500  # Stay well below SQLite's bound-parameter limit
+EXPORT_BATCH_SIZE = 500
+EVENT_DAYS = 7
 
 # --------------------------------------------------
 # Utility Functions
@@ -24,6 +29,11 @@ def generate_user_id(first_name, last_name, phone):
     hash_part = hashlib.sha256(full_name.encode()).hexdigest()[:8]
     return f"{phone_clean}_{first_name_clean}_{last_name_clean}_{hash_part}"
 
+def chunked(items, size=SQLITE_MAX_PARAMS):
+    """Yield successive slices of `items` small enough for an IN (...) clause."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 def get_db_connection():
     """Get a SQLite database connection with row factory."""
     conn = sqlite3.connect(DB_NAME)
@@ -56,6 +66,41 @@ def init_db():
         )
     ''')
 
+    # Lookup index for payment reconciliation
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_payment_id ON users(payment_id)')
+
+    # Normalized keys for duplicate detection
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_dedup (
+            user_id TEXT PRIMARY KEY,
+            phone_norm TEXT NOT NULL,
+            name_norm TEXT NOT NULL,
+            name_phonetic TEXT NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_dedup_phone ON user_dedup(phone_norm)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_dedup_phonetic ON user_dedup(name_phonetic)')
+
+    # Backfill keys for users registered before the dedup index existed
+    conn.create_function('normalize_phone', 1, normalize_phone, deterministic=True)
+    conn.create_function('normalize_name', 2, normalize_name, deterministic=True)
+    conn.create_function('phonetic_key', 1, phonetic_key, deterministic=True)
+    cursor.execute('''
+        INSERT INTO user_dedup (user_id, phone_norm, name_norm, name_phonetic)
+        SELECT id, normalize_phone(phone), normalize_name(first_name, last_name),
+               phonetic_key(normalize_name(first_name, last_name))
+        FROM users
+        WHERE id NOT IN (SELECT user_id FROM user_dedup)
+    ''')
+    # Refresh name keys written by an older normalize_name (it used to split Indic names at vowel signs)
+    cursor.execute('''
+        UPDATE user_dedup
+        SET name_norm = (SELECT normalize_name(first_name, last_name) FROM users WHERE id = user_id),
+            name_phonetic = (SELECT phonetic_key(normalize_name(first_name, last_name)) FROM users WHERE id = user_id)
+        WHERE name_norm != (SELECT normalize_name(first_name, last_name) FROM users WHERE id = user_id)
+    ''')
+
     # Attendance table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS attendance (
@@ -72,13 +117,178 @@ def init_db():
         )
     ''')
 
+    # Server-side registration drafts (form data kept between register and payment success)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS registration_drafts (
+            token TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_registration_drafts_expires ON registration_drafts(expires_at)')
+
+    init_rollups(cursor)
+
     conn.commit()
     conn.close()
 
+# --------------------------------------------------
+# Center / Preacher Rollups
+# --------------------------------------------------
+
+ROLLUP_UPSERT = '''
+    INSERT INTO rollup_counts (metric, day, center, preacher, count)
+    SELECT '{metric}', {day}, center, preacher, 1 FROM users WHERE id = {user_id} AND true
+    ON CONFLICT(metric, day, center, preacher) DO UPDATE SET count = count + 1;
+'''
+
+def init_rollups(cursor):
+    """
+    Create the rollup_counts table and the triggers that keep it current.
+
+    Metrics: 'registered' and 'confirmed' are keyed by calendar date,
+    'attended' by event day (day_1 .. day_7). Triggers fire inside the same
+    transaction as the insert / confirm / check-in / delete, so every code path
+    (single, bulk, reconciliation, admin registration) stays consistent.
+
+    Counts describe the users table as it is: deleting a registration (e.g.
+    rejecting a pending one) takes it back out of 'registered', and out of
+    'confirmed' if it was confirmed. Check-ins already recorded in 'attended'
+    stay. The dates a user was counted under are kept on the row
+    (registered_on / confirmed_on) so the delete hits the same bucket.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_counts (
+            metric TEXT NOT NULL,
+            day TEXT NOT NULL,
+            center TEXT NOT NULL,
+            preacher TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, day, center, preacher)
+        )
+    ''')
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'rollup_%'")
+    existing = {row[0] for row in cursor.fetchall()}
+    cursor.execute('SELECT 1 FROM rollup_counts LIMIT 1')
+    needs_backfill = not existing and cursor.fetchone() is None
+
+    cursor.execute('PRAGMA table_info(users)')
+    columns = {row[1] for row in cursor.fetchall()}
+    for column in ('registered_on', 'confirmed_on'):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE users ADD COLUMN {column} TEXT')  # NULL = counted under 'unknown'
+
+    today = "date('now', 'localtime')"
+    triggers = {
+        'rollup_registered': f'''
+            CREATE TRIGGER rollup_registered AFTER INSERT ON users
+            BEGIN
+                UPDATE users SET registered_on = {today} WHERE id = NEW.id;
+                {ROLLUP_UPSERT.format(metric='registered', day=today, user_id='NEW.id')}
+            END
+        ''',
+        # adm_register inserts already-confirmed users
+        'rollup_confirmed_on_insert': f'''
+            CREATE TRIGGER rollup_confirmed_on_insert AFTER INSERT ON users
+            WHEN NEW.is_pending = 0
+            BEGIN
+                UPDATE users SET confirmed_on = {today} WHERE id = NEW.id;
+                {ROLLUP_UPSERT.format(metric='confirmed', day=today, user_id='NEW.id')}
+            END
+        ''',
+        'rollup_confirmed': f'''
+            CREATE TRIGGER rollup_confirmed AFTER UPDATE OF is_pending ON users
+            WHEN OLD.is_pending = 1 AND NEW.is_pending = 0
+            BEGIN
+                UPDATE users SET confirmed_on = {today} WHERE id = NEW.id;
+                {ROLLUP_UPSERT.format(metric='confirmed', day=today, user_id='NEW.id')}
+            END
+        ''',
+        'rollup_deleted': '''
+            CREATE TRIGGER rollup_deleted AFTER DELETE ON users
+            BEGIN
+                UPDATE rollup_counts SET count = count - 1
+                WHERE metric = 'registered' AND day = COALESCE(OLD.registered_on, 'unknown')
+                  AND center = OLD.center AND preacher = OLD.preacher;
+                UPDATE rollup_counts SET count = count - 1
+                WHERE OLD.is_pending = 0 AND metric = 'confirmed' AND day = COALESCE(OLD.confirmed_on, 'unknown')
+                  AND center = OLD.center AND preacher = OLD.preacher;
+            END
+        ''',
+    }
+    for n in range(1, EVENT_DAYS + 1):
+        triggers[f'rollup_attended_day_{n}'] = f'''
+            CREATE TRIGGER rollup_attended_day_{n} AFTER UPDATE OF day_{n} ON attendance
+            WHEN NEW.day_{n} = 1 AND COALESCE(OLD.day_{n}, 0) = 0
+            BEGIN {ROLLUP_UPSERT.format(metric='attended', day=f"'day_{n}'", user_id='NEW.user_id')} END
+        '''
+    for name, sql in triggers.items():
+        # Recreated on every start so databases set up by an older version get the current definitions
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(sql)
+
+    if needs_backfill:
+        # Registration/confirmation dates were never stored, so history lands under 'unknown'
+        cursor.execute('''
+            INSERT INTO rollup_counts (metric, day, center, preacher, count)
+            SELECT 'registered', 'unknown', center, preacher, COUNT(*) FROM users GROUP BY center, preacher
+        ''')
+        cursor.execute('''
+            INSERT INTO rollup_counts (metric, day, center, preacher, count)
+            SELECT 'confirmed', 'unknown', center, preacher, COUNT(*) FROM users
+            WHERE is_pending = 0 GROUP BY center, preacher
+        ''')
+        for n in range(1, EVENT_DAYS + 1):
+            cursor.execute(f'''
+                INSERT INTO rollup_counts (metric, day, center, preacher, count)
+                SELECT 'attended', 'day_{n}', u.center, u.preacher, COUNT(*)
+                FROM attendance a JOIN users u ON u.id = a.user_id
+                WHERE a.day_{n} = 1 GROUP BY u.center, u.preacher
+            ''')
+
+def fetch_rollups(metric=None):
+    """Return rollup rows (metric, day, center, preacher, count), optionally for one metric."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        query = 'SELECT metric, day, center, preacher, count FROM rollup_counts'
+        params = ()
+        if metric:
+            query += ' WHERE metric = ?'
+            params = (metric,)
+        cursor.execute(query + ' ORDER BY metric, day, center, preacher', params)
+        return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+    finally:
+        conn.close()
+
+def fetch_rollup_summary():
+    """Pivot rollups into one row per (center, preacher) for the dashboard panel."""
+    summary = {}
+    for row in fetch_rollups():
+        key = (row['center'], row['preacher'])
+        entry = summary.setdefault(key, {
+            'center': row['center'], 'preacher': row['preacher'], 'registered': 0, 'confirmed': 0,
+            **{f'day_{n}': 0 for n in range(1, EVENT_DAYS + 1)},
+        })
+        if row['metric'] == 'attended':
+            entry[row['day']] += row['count']
+        else:
+            entry[row['metric']] += row['count']
+    return sorted(summary.values(), key=lambda e: (-e['registered'], e['center'], e['preacher']))
+
 # --------------------------------------------------
 # User Management
 # --------------------------------------------------
 
+def dedup_keys(first_name, last_name, phone):
+    """Return (phone_norm, name_norm, name_phonetic) used by the user_dedup index."""
+    name_norm = normalize_name(first_name, last_name)
+    return normalize_phone(phone), name_norm, phonetic_key(name_norm)
+
 def insert_user(first_name, last_name, email, phone, age, preacher, center, payment_id, message=None, is_pending=1):
     """Insert a new user into the database."""
     user_id = generate_user_id(first_name, last_name, phone)
@@ -89,6 +299,10 @@ def insert_user(first_name, last_name, email, phone, age, preacher, center, paym
             INSERT INTO users (id, first_name, last_name, email, phone, age, preacher, center, message, payment_id, is_pending)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (user_id, first_name, last_name, email, phone, age, preacher, center, message, payment_id, is_pending))
+        cursor.execute('''
+            INSERT OR REPLACE INTO user_dedup (user_id, phone_norm, name_norm, name_phonetic)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, *dedup_keys(first_name, last_name, phone)))
         conn.commit()
         return True
     except sqlite3.IntegrityError:
@@ -120,6 +334,180 @@ def check_id_exists(first_name, last_name, phone, db_file='database.db', table_n
     finally:
         conn.close()
 
+def find_duplicate_registration(first_name, last_name, phone):
+    """
+    Look up an existing registration that is the same as, or a near-duplicate of,
+    the given details. Candidates sharing the normalized phone number are fetched
+    in one indexed query and compared by name. Returns (user_id, reason) or None;
+    a blocking reason (see BLOCKING_REASONS) wins over a fuzzy match.
+    """
+    user_id = generate_user_id(first_name, last_name, phone)
+    phone_norm, name_norm, name_phonetic = dedup_keys(first_name, last_name, phone)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT u.id, d.name_norm, d.name_phonetic
+            FROM users u
+            LEFT JOIN user_dedup d ON d.user_id = u.id
+            WHERE u.id = ?
+            UNION ALL
+            SELECT d.user_id, d.name_norm, d.name_phonetic
+            FROM user_dedup d
+            JOIN users u ON u.id = d.user_id
+            WHERE d.phone_norm = ? AND d.user_id != ?
+        ''', (user_id, phone_norm, user_id))
+        fuzzy = None
+        for row in cursor.fetchall():
+            if row['id'] == user_id:
+                return row['id'], 'same_id'
+            reason = duplicate_reason(name_norm, name_phonetic, row['name_norm'], row['name_phonetic'])
+            if reason in BLOCKING_REASONS:
+                return row['id'], reason
+            if reason and fuzzy is None:
+                fuzzy = (row['id'], reason)
+        return fuzzy
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+    finally:
+        conn.close()
+
+def find_duplicate_groups():
+    """
+    Offline scan of all users for likely duplicates.
+    Users are blocked by normalized phone and by phonetic name key, then
+    compared pairwise within each block. Returns a list of pair dicts.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT u.id, u.first_name, u.last_name, u.phone, u.is_pending,
+                   d.phone_norm, d.name_norm, d.name_phonetic
+            FROM users u
+            JOIN user_dedup d ON d.user_id = u.id
+        ''')
+        rows = [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+    blocks = {}
+    for row in rows:
+        blocks.setdefault(('phone', row['phone_norm']), []).append(row)
+        blocks.setdefault(('name', row['name_phonetic']), []).append(row)
+
+    pairs, seen = [], set()
+    for (block_type, _), members in blocks.items():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                key = tuple(sorted((a['id'], b['id'])))
+                if key in seen:
+                    continue
+                if block_type == 'phone':
+                    reason = duplicate_reason(a['name_norm'], a['name_phonetic'], b['name_norm'], b['name_phonetic'])
+                else:
+                    # Different phones only count when the names match exactly
+                    reason = 'same_name_other_phone' if a['name_norm'] == b['name_norm'] else None
+                if reason:
+                    seen.add(key)
+                    pairs.append({'id_a': a['id'], 'id_b': b['id'], 'reason': reason,
+                                  'name_a': f"{a['first_name']} {a['last_name']}",
+                                  'name_b': f"{b['first_name']} {b['last_name']}",
+                                  'phone_a': a['phone'], 'phone_b': b['phone']})
+    return pairs
+
+# --------------------------------------------------
+# Bulk Admin Actions
+# --------------------------------------------------
+
+def confirm_users(user_ids):
+    """
+    Confirm many pending users in a single transaction.
+
+    Returns a per-id report ('confirmed', 'already_confirmed', 'not_found')
+    and the (email, user_id) pairs that still need a notification.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    report = {uid: 'not_found' for uid in user_ids}
+    notifications = []
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        rows = []
+        for chunk in chunked(user_ids):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, email, is_pending FROM users WHERE id IN ({placeholders})', chunk)
+            rows.extend(cursor.fetchall())
+
+        pending = []
+        for row in rows:
+            if row['is_pending']:
+                pending.append(row)
+            else:
+                report[row['id']] = 'already_confirmed'
+
+        # QR codes are written before the transaction so the write lock is held briefly
+        qr_codes = {row['id']: generate_qr_code(row['id']) for row in pending}
+
+        # A concurrent bulk call or /reconcile may confirm the same rows after the
+        # read above, so only rows this UPDATE actually flips count as confirmed.
+        confirmed = []
+        with conn:
+            for row in pending:
+                cursor.execute('UPDATE users SET is_pending = 0 WHERE id = ? AND is_pending = 1', (row['id'],))
+                if cursor.rowcount:
+                    confirmed.append(row)
+                    cursor.execute(
+                        'INSERT OR IGNORE INTO attendance (user_id, qr_code_location) VALUES (?, ?)',
+                        (row['id'], qr_codes[row['id']])
+                    )
+                else:
+                    report[row['id']] = 'already_confirmed'
+
+        for row in confirmed:
+            report[row['id']] = 'confirmed'
+            notifications.append((row['email'], row['id']))
+
+        print(f"[INFO] Bulk confirmed {len(confirmed)} of {len(user_ids)} users")
+        return report, notifications
+
+    except sqlite3.Error as e:
+        print(f"[ERROR] Bulk confirm failed: {e}")
+        print(traceback.format_exc())
+        raise
+    finally:
+        conn.close()
+
+def delete_users(user_ids):
+    """Delete many users in a single transaction and return a per-id report."""
+    user_ids = list(dict.fromkeys(user_ids))
+    report = {uid: 'not_found' for uid in user_ids}
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        with conn:
+            for chunk in chunked(user_ids):
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'SELECT id FROM users WHERE id IN ({placeholders})', chunk)
+                found = [row['id'] for row in cursor.fetchall()]
+                cursor.execute(f'DELETE FROM user_dedup WHERE user_id IN ({placeholders})', chunk)
+                cursor.execute(f'DELETE FROM users WHERE id IN ({placeholders})', chunk)
+                for uid in found:
+                    report[uid] = 'deleted'
+
+        print(f"[INFO] Bulk deleted {sum(v == 'deleted' for v in report.values())} of {len(user_ids)} users")
+        return report
+
+    except sqlite3.Error as e:
+        print(f"[ERROR] Bulk delete failed: {e}")
+        print(traceback.format_exc())
+        raise
+    finally:
+        conn.close()
+
 # --------------------------------------------------
 # Attendance Management
 # --------------------------------------------------
@@ -226,3 +614,51 @@ def fetch_attendance_records(page, search_query):
         return [], page, 0, search_query
     finally:
         conn.close()
+
+# --------------------------------------------------
+# Registration Export
+# --------------------------------------------------
+
+EXPORT_COLUMNS = [
+    'id', 'first_name', 'last_name', 'email', 'phone', 'age', 'preacher', 'center',
+    'message', 'payment_id', 'is_pending',
+] + [f'day_{n}' for n in range(1, EVENT_DAYS + 1)]
+
+def iter_registrations(center=None, preacher=None, day=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield registration rows (users joined with attendance) as tuples in EXPORT_COLUMNS order.
+    Rows are pulled from the cursor in batches so memory stays flat regardless of table size.
+    `day` (1-7) keeps only users who attended that day; filters are validated eagerly.
+    """
+    clauses, params = [], []
+    if center:
+        clauses.append('u.center = ? COLLATE NOCASE')
+        params.append(center)
+    if preacher:
+        clauses.append('u.preacher = ? COLLATE NOCASE')
+        params.append(preacher)
+    if day is not None:
+        if not 1 <= int(day) <= EVENT_DAYS:
+            raise ValueError(f"day must be between 1 and {EVENT_DAYS}")
+        clauses.append(f'a.day_{int(day)} = 1')
+
+    columns = ', '.join(f'a.{c}' if c.startswith('day_') else f'u.{c}' for c in EXPORT_COLUMNS)
+    query = f'SELECT {columns} FROM users u LEFT JOIN attendance a ON a.user_id = u.id'
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += ' ORDER BY u.rowid'
+
+    return _iter_rows(query, params, batch_size)
+
+def _iter_rows(query, params, batch_size):
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+    finally:
+        conn.close()
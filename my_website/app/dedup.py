@@ -0,0 +1,87 @@
+# --------------------------------------------------
+# Imports & Constants
+# --------------------------------------------------
+
+import re
+import unicodedata
+
+NAME_SIMILARITY_THRESHOLD = 0.6
+# Reasons that reject a registration outright. 'phonetic' / 'trigram' matches on a
+# shared phone are often family members, so they only show up in dedup_report.py.
+BLOCKING_REASONS = {'same_id', 'same_name'}
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+# --------------------------------------------------
+# Normalization
+# --------------------------------------------------
+
+def normalize_phone(phone):
+    """Keep digits only and drop a country prefix, e.g. '+91 98765-43210' -> '9876543210'."""
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-10:]
+
+def name_char(char):
+    """Letters and combining marks stay (Devanagari/Bengali vowel signs and virama are Mn/Mc),
+    format characters such as ZWJ/ZWNJ are dropped, everything else separates words."""
+    category = unicodedata.category(char)
+    if category[0] in 'LM':
+        return char
+    return '' if category == 'Cf' else ' '
+
+def normalize_name(first_name, last_name):
+    """
+    Lower-case, strip digits/punctuation/symbols and collapse whitespace, e.g.
+    ' Pawan 3 ' -> 'pawan', 'विकास  शर्मा.' -> 'विकास शर्मा'.
+    """
+    full_name = unicodedata.normalize('NFKC', f"{first_name or ''} {last_name or ''}").lower()
+    full_name = ''.join(name_char(char) for char in full_name)
+    return ' '.join(full_name.split())
+
+def phonetic_key(normalized_name):
+    """Soundex code per word; non-Latin scripts fall back to the normalized name."""
+    codes = []
+    for word in normalized_name.split():
+        if not word.isascii():
+            return normalized_name
+        code, last = word[0], SOUNDEX_CODES.get(word[0], '')
+        for char in word[1:]:
+            digit = SOUNDEX_CODES.get(char, '')
+            if digit and digit != last:
+                code += digit
+            if char not in 'hw':
+                last = digit
+        codes.append((code + '000')[:4])
+    return ' '.join(codes)
+
+# --------------------------------------------------
+# Similarity
+# --------------------------------------------------
+
+def trigrams(normalized_name):
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def name_similarity(name_a, name_b):
+    """Jaccard similarity of the two names' trigram sets (0.0 - 1.0)."""
+    grams_a, grams_b = trigrams(name_a), trigrams(name_b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+def duplicate_reason(name_a, phonetic_a, name_b, phonetic_b):
+    """Return why two normalized names look like the same person, or None."""
+    if name_a == name_b:
+        return 'same_name'
+    if phonetic_a == phonetic_b:
+        return 'phonetic'
+    if name_similarity(name_a, name_b) >= NAME_SIMILARITY_THRESHOLD:
+        return 'trigram'
+    return None
@@ -0,0 +1,86 @@
+# --------------------------------------------------
+# Imports & Constants
+# --------------------------------------------------
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+
+from app.database import get_db_connection
+
+DRAFT_TTL_SECONDS = 24 * 60 * 60  # Abandoned registrations can be resumed for a day
+SWEEP_INTERVAL_SECONDS = 15 * 60
+
+# --------------------------------------------------
+# Draft Registration Store
+# --------------------------------------------------
+
+def save_draft(data, ttl=DRAFT_TTL_SECONDS):
+    """Store registration form data server-side and return an opaque token."""
+    token = secrets.token_urlsafe(24)
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute(
+                'INSERT INTO registration_drafts (token, data, created_at, expires_at) VALUES (?, ?, ?, ?)',
+                (token, json.dumps(data), now, now + ttl)
+            )
+        return token
+    finally:
+        conn.close()
+
+def load_draft(token):
+    """Return the draft's form data, or None if it is missing or expired."""
+    if not token:
+        return None
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            'SELECT data FROM registration_drafts WHERE token = ? AND expires_at > ?',
+            (token, time.time())
+        ).fetchone()
+        return json.loads(row['data']) if row else None
+    finally:
+        conn.close()
+
+def delete_draft(token):
+    """Remove a draft once the registration has been stored."""
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute('DELETE FROM registration_drafts WHERE token = ?', (token,))
+    finally:
+        conn.close()
+
+def purge_expired_drafts():
+    """Delete expired drafts and return how many were removed."""
+    conn = get_db_connection()
+    try:
+        with conn:
+            cursor = conn.execute('DELETE FROM registration_drafts WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+# --------------------------------------------------
+# Background Sweep
+# --------------------------------------------------
+
+def _sweep_forever(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            removed = purge_expired_drafts()
+            if removed:
+                print(f"[INFO] Purged {removed} expired registration drafts")
+        except sqlite3.Error as e:
+            print(f"[ERROR] Draft sweep failed: {e}")
+
+def start_draft_sweeper(interval=SWEEP_INTERVAL_SECONDS):
+    """Start a daemon thread that periodically purges expired drafts."""
+    sweeper = threading.Thread(target=_sweep_forever, args=(interval,), daemon=True, name='draft-sweeper')
+    sweeper.start()
+    return sweeper
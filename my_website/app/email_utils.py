@@ -1,13 +1,16 @@
 import os
+import threading
 
 import resend
 from dotenv import load_dotenv
 
 load_dotenv()  # THIS MUST BE CALLED EARLY
 resend.api_key = os.getenv("EMAIL_KEY_RESEND")
+# EMAIL_BACKEND=stub skips the Resend API (local runs and load tests)
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "resend")
 
 
-def send_email(email_to: str, user_id):
+def build_email_params(email_to: str, user_id) -> resend.Emails.SendParams:
     attachment: resend.Attachment = {
       "path": f"https://kathamritam.online/static/qr_codes/{user_id}.png",
       "filename": f"qr_{user_id}.png",
@@ -97,9 +100,32 @@ def send_email(email_to: str, user_id):
 </body>
 </html>"""
     }
+    return params
+
+
+def send_email(email_to: str, user_id):
+    params = build_email_params(email_to, user_id)
+    if EMAIL_BACKEND == "stub":
+      return {'success': True, 'email': {'id': f"stub_{user_id}"}}
 
     try:
       email = resend.Emails.send(params)
       return {'success': True, 'email': email}
     except Exception as e:
       return {'success': False, 'error': str(e)}
+
+
+def _send_email_batch(recipients):
+    for email_to, user_id in recipients:
+      result = send_email(email_to, user_id)
+      if not result['success']:
+        print(f"[ERROR] Email to {email_to} for {user_id} failed: {result['error']}")
+
+
+def send_emails_in_background(recipients):
+    """Send QR emails for many (email, user_id) pairs without blocking the request."""
+    if not recipients:
+      return None
+    worker = threading.Thread(target=_send_email_batch, args=(list(recipients),), daemon=True)
+    worker.start()
+    return worker
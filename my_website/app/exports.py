@@ -0,0 +1,52 @@
+# --------------------------------------------------
+# Imports & Constants
+# --------------------------------------------------
+
+import csv
+import io
+import tempfile
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX export is optional
+    Workbook = None
+
+CSV_FLUSH_ROWS = 500
+XLSX_CHUNK_SIZE = 64 * 1024
+
+# --------------------------------------------------
+# Streaming Writers
+# --------------------------------------------------
+
+def stream_csv(header, rows):
+    """Yield UTF-8 CSV chunks of roughly CSV_FLUSH_ROWS rows each."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff')  # BOM so Excel detects UTF-8 (Hindi/Bengali names)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode('utf-8')
+
+
+def stream_xlsx(header, rows, sheet_title='Registrations'):
+    """
+    Write rows with openpyxl's write-only workbook (rows are flushed to disk
+    as they are appended) and yield the finished file in chunks.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(XLSX_CHUNK_SIZE):
+            yield chunk
@@ -0,0 +1,69 @@
+# --------------------------------------------------
+# Imports & Constants
+# --------------------------------------------------
+
+import json
+import os
+
+from flask import g, request, session
+from jinja2 import FileSystemBytecodeCache
+
+DEFAULT_LANGUAGE = 'en'
+SUPPORTED_LANGUAGES = ('en', 'hi', 'bn')
+LANGUAGE_ALIASES = {'ben': 'bn'}  # Legacy /register_ben URL
+TRANSLATIONS_DIR = os.path.join(os.path.dirname(__file__), 'translations')
+
+# --------------------------------------------------
+# Message Catalogs
+# --------------------------------------------------
+
+def load_catalogs():
+    """Parse every translations/<lang>.json once; English strings are the message ids."""
+    catalogs = {}
+    for lang in SUPPORTED_LANGUAGES:
+        path = os.path.join(TRANSLATIONS_DIR, f'{lang}.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                catalogs[lang] = json.load(f)
+    return catalogs
+
+CATALOGS = load_catalogs()
+
+def gettext(message):
+    return CATALOGS.get(g.get('lang', DEFAULT_LANGUAGE), {}).get(message, message)
+
+def ngettext(singular, plural, n):
+    return gettext(singular if n == 1 else plural)
+
+# --------------------------------------------------
+# Language Negotiation
+# --------------------------------------------------
+
+def negotiate_language(requested=None):
+    """
+    Pick the page language: explicit (?lang= or route) > remembered in session
+    > Accept-Language header > English. Stores the result on `g` for gettext.
+    """
+    requested = requested or request.args.get('lang')
+    lang = LANGUAGE_ALIASES.get(requested, requested)
+    if lang in SUPPORTED_LANGUAGES:
+        session['lang'] = lang
+    elif session.get('lang') in SUPPORTED_LANGUAGES:
+        lang = session['lang']
+    else:
+        lang = request.accept_languages.best_match(SUPPORTED_LANGUAGES, default=DEFAULT_LANGUAGE)
+    g.lang = lang
+    return lang
+
+# --------------------------------------------------
+# App Setup
+# --------------------------------------------------
+
+def init_i18n(app):
+    """Enable {{ _('...') }} in templates and cache compiled templates on disk."""
+    cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    app.jinja_env.add_extension('jinja2.ext.i18n')
+    app.jinja_env.install_gettext_callables(gettext, ngettext, newstyle=True)
@@ -0,0 +1,113 @@
+# --------------------------------------------------
+# Imports & Constants
+# --------------------------------------------------
+
+import csv
+import io
+import sqlite3
+
+from app.database import get_db_connection, confirm_users
+
+# Razorpay exports name the payment column differently per report
+PAYMENT_ID_COLUMNS = ('payment_id', 'entity_id', 'razorpay_payment_id', 'id')
+SETTLED_STATUSES = {'captured', 'settled', 'processed', 'success'}
+
+# --------------------------------------------------
+# Settlement File Parsing
+# --------------------------------------------------
+
+def read_settlement_csv(stream):
+    """
+    Extract settled payment IDs from a provider CSV (text or binary stream).
+    Rows with a non-payment `type` or an unsettled `status` are skipped.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig')
+
+    reader = csv.DictReader(stream)
+    columns = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+    id_column = next((columns[c] for c in PAYMENT_ID_COLUMNS if c in columns), None)
+    if id_column is None:
+        raise ValueError(f"No payment ID column found, expected one of {', '.join(PAYMENT_ID_COLUMNS)}")
+
+    status_column = columns.get('status')
+    type_column = columns.get('type')
+
+    payment_ids = []
+    for row in reader:
+        payment_id = (row.get(id_column) or '').strip()
+        if not payment_id:
+            continue
+        if type_column and (row.get(type_column) or '').strip().lower() not in ('', 'payment'):
+            continue
+        if status_column and (row.get(status_column) or '').strip().lower() not in SETTLED_STATUSES:
+            continue
+        payment_ids.append(payment_id)
+    return payment_ids
+
+# --------------------------------------------------
+# Reconciliation
+# --------------------------------------------------
+
+def reconcile_payments(payment_ids, auto_confirm=True):
+    """
+    Join settled payment IDs against users.payment_id and confirm matches in bulk.
+
+    Returns a report with the confirmed ids, rows that were already confirmed,
+    settled payments with no registration and pending registrations with no
+    settled payment.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('CREATE TEMP TABLE settlement (payment_id TEXT PRIMARY KEY)')
+        cursor.executemany('INSERT OR IGNORE INTO settlement (payment_id) VALUES (?)',
+                           ((pid,) for pid in payment_ids))
+
+        # Driven from the small settlement table so users is probed via idx_users_payment_id
+        cursor.execute('''
+            SELECT u.id, u.payment_id, u.is_pending
+            FROM settlement s
+            JOIN users u ON u.payment_id = s.payment_id
+        ''')
+        matched = cursor.fetchall()
+
+        cursor.execute('''
+            SELECT s.payment_id
+            FROM settlement s
+            LEFT JOIN users u ON u.payment_id = s.payment_id
+            WHERE u.id IS NULL
+        ''')
+        unknown_payments = [row['payment_id'] for row in cursor.fetchall()]
+
+        cursor.execute('''
+            SELECT id, payment_id
+            FROM users
+            WHERE is_pending = 1
+              AND (payment_id IS NULL OR payment_id NOT IN (SELECT payment_id FROM settlement))
+        ''')
+        unpaid = [{'id': row['id'], 'payment_id': row['payment_id'] or 'N/A'} for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        raise
+    finally:
+        conn.close()
+
+    to_confirm = [row['id'] for row in matched if row['is_pending']]
+    already_confirmed = [row['id'] for row in matched if not row['is_pending']]
+    confirmed = []
+    notifications = []
+    if auto_confirm and to_confirm:
+        # Rows confirmed concurrently since the read above come back as 'already_confirmed'
+        outcome, notifications = confirm_users(to_confirm)
+        confirmed = [uid for uid, status in outcome.items() if status == 'confirmed']
+        already_confirmed += [uid for uid, status in outcome.items() if status == 'already_confirmed']
+
+    report = {
+        'confirmed': confirmed,
+        'matched_pending': [] if auto_confirm else to_confirm,
+        'already_confirmed': already_confirmed,
+        'unknown_payments': unknown_payments,
+        'unpaid_pending': unpaid,
+    }
+    return report, notifications
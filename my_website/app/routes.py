@@ -2,7 +2,7 @@
 # Imports and Configuration
 # ----------------------
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 import os
 
@@ -12,9 +12,15 @@ from dotenv import load_dotenv
 import app
 from app.database import (
     insert_user, create_attendance_record, get_users, get_db_connection,
-    check_id_exists, fetch_attendance_records
+    find_duplicate_registration, fetch_attendance_records, confirm_users, delete_users,
+    iter_registrations, EXPORT_COLUMNS, fetch_rollups, fetch_rollup_summary, EVENT_DAYS
 )
-from app.email_utils import send_email
+from app import exports
+from app.email_utils import send_email, send_emails_in_background
+from app.reconciliation import read_settlement_csv, reconcile_payments
+from app.drafts import save_draft, load_draft, delete_draft
+from app.dedup import BLOCKING_REASONS
+from app.i18n import negotiate_language
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -37,42 +43,46 @@ def home():
 # ----------------------
 # Registration Handlers (Multi-language)
 # ----------------------
-def handle_registration(form_template):
+def handle_registration(lang=None):
     """
-    Shared logic for user registration.
+    Shared logic for user registration; one template rendered in the negotiated language.
     """
     if request.method == 'POST':
-        if check_id_exists(
+        duplicate = find_duplicate_registration(
             first_name=request.form['first_name'],
             last_name=request.form['last_name'],
             phone=request.form['phone']
-        ):
+        )
+        if duplicate and duplicate[1] in BLOCKING_REASONS:
+            logging.info(f"Duplicate registration of {duplicate[0]} rejected ({duplicate[1]})")
             return "User already exists"
+        if duplicate:
+            # Possibly the same person, possibly a family member sharing the phone: admins review it in dedup_report.py
+            logging.info(f"Possible duplicate of {duplicate[0]} ({duplicate[1]}) allowed, left for review")
 
-        # Save form data to session
+        # Keep form data server-side; the cookie only carries the draft token
         data = {k: request.form.get(k) for k in ['first_name', 'last_name', 'email', 'phone', 'age', 'preacher', 'center', 'message']}
-        for k, v in data.items():
-            session[k] = v
-            logging.info(f"{k}: {v}")
+        session['draft_token'] = save_draft(data)
+        logging.info(f"Registration draft saved for {data['first_name']} {data['last_name']}")
 
         return redirect(url_for('main.payment'))
 
-    return render_template(form_template)
+    return render_template('register.html', lang=negotiate_language(lang))
 
 
 @main.route('/register', methods=['GET', 'POST'])
 def register():
-    return handle_registration('register.html')
+    return handle_registration()
 
 
 @main.route('/register_hi', methods=['GET', 'POST'])
 def register_hi():
-    return handle_registration('register_hi.html')
+    return handle_registration('hi')
 
 
 @main.route('/register_ben', methods=['GET', 'POST'])
 def register_ben():
-    return handle_registration('register_ben.html')
+    return handle_registration('bn')
 
 
 # ----------------------
@@ -133,7 +143,20 @@ def adm_register():
 # ----------------------
 @main.route('/payment', methods=['GET', 'POST'])
 def payment():
-    return render_template('payment.html')
+    token = session.get('draft_token')
+    resume_url = url_for('main.resume_registration', token=token, _external=True) if load_draft(token) else None
+    return render_template('payment.html', resume_url=resume_url)
+
+
+@main.route('/resume/<token>')
+def resume_registration(token):
+    """
+    Pick up an abandoned registration from its draft token.
+    """
+    if not load_draft(token):
+        return redirect(url_for('main.register'))
+    session['draft_token'] = token
+    return redirect(url_for('main.payment'))
 
 
 @main.route('/success')
@@ -141,14 +164,20 @@ def success():
     """
     After successful payment, insert user and redirect to pending page.
     """
-    user_data = {k: session.get(k) for k in ['first_name', 'last_name', 'email', 'phone', 'age', 'preacher', 'center', 'message']}
-    user_data['payment_id'] = request.args.get('payment_id')
+    token = session.get('draft_token')
+    user_data = load_draft(token)
+    payment_id = request.args.get('payment_id')
+    if user_data is None:
+        logging.warning(f"Payment {payment_id} returned without a registration draft")
+        return redirect(url_for('main.register'))
+    user_data['payment_id'] = payment_id
 
     insert_user(
         user_data['first_name'], user_data['last_name'], user_data['email'], user_data['phone'],
         int(user_data['age']), user_data['preacher'], user_data['center'],
         user_data['payment_id'], user_data['message'], is_pending=True
     )
+    delete_draft(token)
     session.clear()
     return redirect(url_for('main.pending_page'))
 
@@ -168,7 +197,57 @@ def dashboard():
     page = int(request.args.get('page', 1))
     search_query = request.args.get('search', '').strip()
     records, current_page, total_pages, search_query = fetch_attendance_records(page, search_query)
-    return render_template('dashboard.html', records=records, current_page=current_page, total_pages=total_pages, search_query=search_query)
+    rollups = fetch_rollup_summary()
+    return render_template('dashboard.html', records=records, current_page=current_page, total_pages=total_pages, search_query=search_query, rollups=rollups)
+
+
+@main.route('/analytics')
+def analytics():
+    """
+    Precomputed registration / confirmation / attendance counts by center, preacher and day.
+    Optional ?metric=registered|confirmed|attended.
+    """
+    if not session.get('is_admin'):
+        return "You are not an admin", 400
+    metric = request.args.get('metric')
+    return jsonify({'rollups': fetch_rollups(metric), 'summary': fetch_rollup_summary()})
+
+
+@main.route('/export')
+def export_registrations():
+    """
+    Stream users joined with attendance as CSV or XLSX.
+    Optional filters: center, preacher, day (1-7 attended).
+    """
+    if not session.get('is_admin'):
+        return "You are not an admin", 400
+
+    file_format = request.args.get('format', 'csv').lower()
+    if file_format not in ('csv', 'xlsx'):
+        return "format must be csv or xlsx", 400
+    if file_format == 'xlsx' and exports.Workbook is None:
+        return "XLSX export needs openpyxl installed", 400
+
+    # type=int would turn a bad day into None and silently export everyone
+    day = request.args.get('day', '').strip() or None
+    if day is not None and day not in {str(n) for n in range(1, EVENT_DAYS + 1)}:
+        return f"day must be a number between 1 and {EVENT_DAYS}", 400
+
+    try:
+        rows = iter_registrations(
+            center=request.args.get('center', '').strip() or None,
+            preacher=request.args.get('preacher', '').strip() or None,
+            day=int(day) if day else None,
+        )
+    except ValueError as e:
+        return str(e), 400
+
+    filename = f"registrations_{datetime.now():%Y%m%d_%H%M}.{file_format}"
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    if file_format == 'xlsx':
+        return Response(exports.stream_xlsx(EXPORT_COLUMNS, rows), headers=headers,
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return Response(exports.stream_csv(EXPORT_COLUMNS, rows), headers=headers, mimetype='text/csv')
 
 
 @main.route('/pending_requests', methods=['GET'])
@@ -231,6 +310,7 @@ def delete_record(uid):
         return jsonify({'success': False, 'message': 'Record not found'}), 404
 
     # cursor.execute('DELETE FROM attendance WHERE user_id = ?', (uid,))
+    cursor.execute('DELETE FROM user_dedup WHERE user_id = ?', (uid,))
     cursor.execute('DELETE FROM users WHERE id = ?', (uid,))
     conn.commit()
     return jsonify({'success': True, 'message': 'Record deleted successfully'})
@@ -254,13 +334,67 @@ def confirm_record(uid):
     return jsonify({'success': False, 'message': 'Record not found'}), 404
 
 
+@main.route('/bulk_action', methods=['POST'])
+def bulk_action():
+    """
+    Confirm or delete many records at once.
+    Expects JSON: {"action": "confirm" | "delete", "ids": [...]}.
+    """
+    if not session.get('is_admin'):
+        return "You are not an admin", 400
+
+    payload = request.get_json(silent=True) or {}
+    action = payload.get('action')
+    ids = payload.get('ids')
+    if action not in ('confirm', 'delete') or not isinstance(ids, list) or not ids:
+        return jsonify({'success': False, 'message': 'Expected an action and a non-empty list of ids'}), 400
+
+    try:
+        if action == 'confirm':
+            report, notifications = confirm_users([str(uid) for uid in ids])
+            send_emails_in_background(notifications)
+        else:
+            report = delete_users([str(uid) for uid in ids])
+    except sqlite3.Error:
+        logging.exception("Bulk %s failed", action)
+        return jsonify({'success': False, 'message': 'Database error, no records were changed'}), 500
+
+    return jsonify({'success': True, 'action': action, 'results': report})
+
+
+@main.route('/reconcile', methods=['POST'])
+def reconcile():
+    """
+    Import a payment provider settlement CSV and auto-confirm matching pending registrations.
+    """
+    if not session.get('is_admin'):
+        return "You are not an admin", 400
+
+    settlement = request.files.get('settlement')
+    if not settlement or not settlement.filename:
+        return jsonify({'success': False, 'message': 'No settlement file uploaded'}), 400
+
+    try:
+        payment_ids = read_settlement_csv(settlement.stream)
+        report, notifications = reconcile_payments(payment_ids)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except sqlite3.Error:
+        logging.exception("Reconciliation failed")
+        return jsonify({'success': False, 'message': 'Database error, no records were changed'}), 500
+
+    send_emails_in_background(notifications)
+    logging.info(f"Reconciled {len(payment_ids)} settled payments, confirmed {len(report['confirmed'])}")
+    return jsonify({'success': True, 'settled_payments': len(payment_ids), **report})
+
+
 # ----------------------
 # Attendance Management
 # ----------------------
+# First event day; EVENT_START_DATE=YYYY-MM-DD moves the window (e.g. for the load test)
+EVENT_START_DATE = datetime.strptime(os.getenv('EVENT_START_DATE', '2025-06-28'), '%Y-%m-%d')
 dates_dict = {
-    "2025-06-28": "day_1", "2025-06-29": "day_2", "2025-06-30": "day_3",
-    "2025-07-01": "day_4", "2025-07-02": "day_5", "2025-07-03": "day_6",
-    "2025-07-04": "day_7"
+    (EVENT_START_DATE + timedelta(days=n)).strftime('%Y-%m-%d'): f"day_{n + 1}" for n in range(EVENT_DAYS)
 }
 
 def update_attendance(user_id) -> bool:
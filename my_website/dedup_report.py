@@ -0,0 +1,33 @@
+"""
+Offline duplicate report over the existing users table.
+
+Usage:
+    python dedup_report.py                 # print CSV to stdout
+    python dedup_report.py duplicates.csv  # write CSV to a file
+"""
+import csv
+import sys
+
+from app.database import init_db, find_duplicate_groups
+
+FIELDS = ['id_a', 'id_b', 'reason', 'name_a', 'name_b', 'phone_a', 'phone_b']
+
+
+def main(argv):
+    init_db()  # Ensures the dedup index exists and is backfilled
+    pairs = find_duplicate_groups()
+
+    out = open(argv[1], 'w', newline='', encoding='utf-8') if len(argv) > 1 else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(pairs)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"{len(pairs)} likely duplicate pairs found", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
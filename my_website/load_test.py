@@ -0,0 +1,208 @@
+"""
+Load test for the Kathamritam registration flow.
+
+Each virtual user walks register -> payment -> success, then an admin session
+confirms the registration and marks attendance. By default a throwaway server is
+started in a temp directory (own database.db and QR folder, EMAIL_BACKEND=stub),
+so production data and the Resend quota are never touched. That server gets
+EVENT_START_DATE=today, so check-ins really write; an attendance call that did not
+mark anything (e.g. an external instance outside its event dates) counts as an error.
+
+Usage:
+    python load_test.py --users 20 --registrations 500
+    python load_test.py --base-url http://127.0.0.1:5000   # existing instance
+
+Reports p50/p95/p99 latency per step and the number of SQLite lock errors
+("database is locked") seen in the server log.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, build_opener, urlopen
+
+from app.database import generate_user_id
+
+ADMIN_USERNAME = 'loadtest'
+ADMIN_PASSWORD = 'loadtest'
+STEPS = ['register', 'payment', 'success', 'confirm', 'attendance']
+
+SERVER_BOOTSTRAP = '''
+import sys
+from run import app
+from app.database import init_db
+init_db()
+app.run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True, debug=False)
+'''
+
+
+# ----------------------
+# Metrics
+# ----------------------
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+
+    def record(self, step, seconds, ok):
+        with self.lock:
+            self.latencies[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# ----------------------
+# Virtual User
+# ----------------------
+class VirtualUser:
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.client = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.admin = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.admin.open(f"{self.base_url}/admin",
+                        urlencode({'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD}).encode(),
+                        timeout=timeout).read()
+
+    def call(self, opener, step, path, data=None, expect=None, expect_status=None):
+        """
+        Time one request. Any 4xx/5xx is an error unless it is `expect_status`;
+        with `expect`, a response without that text is an error too.
+        """
+        body = urlencode(data).encode() if data is not None else None
+        start = time.perf_counter()
+        try:
+            with opener.open(f"{self.base_url}{path}", body, timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except HTTPError as e:
+            status, content = e.code, e.read()
+        except (URLError, OSError):
+            status, content = None, b''
+        if expect_status is not None:
+            ok = status == expect_status
+        else:
+            ok = status is not None and status < 400
+        ok = ok and (expect is None or expect in content)
+        self.stats.record(step, time.perf_counter() - start, ok)
+
+    def run(self, index):
+        first_name, last_name, phone = f"load{index}", 'tester', f"9{index:09d}"
+        form = {
+            'first_name': first_name, 'last_name': last_name, 'email': f"load{index}@example.com",
+            'phone': phone, 'age': '30', 'preacher': 'Load Preacher', 'center': 'load_center', 'message': '',
+        }
+        user_id = generate_user_id(first_name, last_name, phone)
+
+        self.call(self.client, 'register', '/register', form)  # follows the redirect to /payment
+        self.call(self.client, 'payment', '/payment')
+        self.call(self.client, 'success', f"/success?payment_id=pay_load_{index}")
+        self.call(self.admin, 'confirm', f"/confirm/{user_id}", {})
+        # /attendance answers 200 either way; only this text means a day was marked
+        self.call(self.admin, 'attendance', f"/attendance/{user_id}", expect=b'Attendance updated')
+
+
+# ----------------------
+# Local Server
+# ----------------------
+def start_server(port, workdir):
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.path.dirname(os.path.abspath(__file__)),
+        'FLASK_SECRET_KEY': 'loadtest',
+        'FLASK_USERNAME': ADMIN_USERNAME,
+        'FLASK_PASSWORD': ADMIN_PASSWORD,
+        'EMAIL_BACKEND': 'stub',
+        'EVENT_START_DATE': time.strftime('%Y-%m-%d'),  # so /attendance writes today
+    }
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen([sys.executable, '-c', SERVER_BOOTSTRAP, str(port)],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urlopen(base_url, timeout=1).read()
+            return process, log, base_url
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Server failed to start, see {log.name}")
+
+
+def count_lock_errors(log_path):
+    with open(log_path, encoding='utf-8', errors='replace') as f:
+        return sum('database is locked' in line for line in f)
+
+
+# ----------------------
+# Entry Point
+# ----------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--registrations', type=int, default=200, help='total registrations to drive')
+    parser.add_argument('--base-url', help='use an existing instance instead of starting one')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kathamritam_load_')
+    process = log = None
+    base_url = args.base_url
+    if not base_url:
+        process, log, base_url = start_server(args.port, workdir)
+        print(f"Started local server at {base_url} (workdir {workdir})")
+
+    stats = Stats()
+    local = threading.local()
+
+    def worker(index):
+        if not hasattr(local, 'user'):
+            local.user = VirtualUser(base_url, stats, args.timeout)
+        local.user.run(index)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            list(pool.map(worker, range(args.registrations)))
+    finally:
+        elapsed = time.perf_counter() - started
+        if process:
+            process.terminate()
+            process.wait()
+            log.close()
+
+    print(f"\n{args.registrations} registrations, {args.users} users, {elapsed:.1f}s "
+          f"({args.registrations / elapsed:.1f} flows/s)\n")
+    print(f"{'step':<12}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step in STEPS:
+        values = sorted(stats.latencies[step])
+        print(f"{step:<12}{len(values):>7}{stats.errors[step]:>8}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}")
+
+    if process:
+        print(f"\nSQLite lock errors in server log: {count_lock_errors(log.name)}")
+    else:
+        print("\nSQLite lock errors: check the server log of the external instance")
+
+
+if __name__ == '__main__':
+    main()